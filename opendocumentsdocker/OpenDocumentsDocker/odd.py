@@ -2,7 +2,6 @@
 
 from PyQt5.QtWidgets import QApplication
 from time import *
-from datetime import datetime
 from krita import *
 from pathlib import Path
 
@@ -13,12 +12,27 @@ logger = logging.getLogger("odd")
 class ODD(Extension):
     dockers = []
     windows = []
-    views = []
+    views = {}
+    nextViewId = 1
+    closedViewEntries = []
+    activeViewIdInWindow = {}
+    viewsNeedResync = False
     documents = []
+    docDataById = {}
+    docIdByKey = {}
+    nextDocId = 1
     unusedCacheSize = 0
     instance = None
     kritaHasFocus = False
     activeDocument = None
+    activeDocId = None
+    docStatePollTimer = None
+    docStatePollQuietTicks = 0
+    docStatePollQuietLimit = 4
+    startupPhase = True
+    DocStateModified = 1
+    DocStateSize = 2
+    DocStateName = 4
     
     def __init__(self, parent):
         logger.debug("ODD:__init__")
@@ -30,6 +44,12 @@ class ODD(Extension):
                 logger.warning("ODD: reactivated.\n     should be safe to continue.")
             else:
                 logger.warning("ODD: activated mid-krita session.\n     please restart krita.")
+            cls.startupPhase = False
+            # go through the resume path, so suspended timers are restarted
+            # and the change detector's stoppers are lifted.
+            cls.kritaHasFocus = bool(QApplication.focusWindow())
+            ODDIdleGovernor.removeSuspendReason(ODDIdleGovernor.SuspendReasonInput)
+            ODDIdleGovernor.updateState()
             return
         
         cls.winForQWin = {}
@@ -39,9 +59,21 @@ class ODD(Extension):
             cls.viewClosedDelay.setInterval(0)
             cls.viewClosedDelay.setSingleShot(True)
             cls.viewClosedDelay.timeout.connect(cls._viewClosed)
+            # krita is starting up until no views or windows have been created for a while.
+            cls.startupIdleTimer = QTimer(self)
+            cls.startupIdleTimer.setInterval(1000)
+            cls.startupIdleTimer.setSingleShot(True)
+            cls.startupIdleTimer.timeout.connect(cls.endStartupPhase)
+            cls.startupIdleTimer.start()
+            cls.docStatePollTimer = QTimer(self)
+            cls.docStatePollTimer.setInterval(500)
+            cls.docStatePollTimer.timeout.connect(cls.pollDocumentStates)
+            ODDIdleGovernor.addPeriodicTimer(cls.docStatePollTimer)
             cls.instance = self
+            cls.wakeDocStatePoll()
         
         ODDImageChangeDetector()
+        ODDIdleGovernor()
         
         QApplication.instance().focusWindowChanged.connect(self.focusWindowChanged)
         
@@ -115,6 +147,9 @@ class ODD(Extension):
     
     def fileRevertInPlaceFinished(self):
         logger.debug("fileRevertInPlaceFinished: deleting fileReverter")
+        # views were moved to the new document behind the registry's back.
+        ODD.updateDocumentsFromViews()
+        ODD.viewsChanged()
         self.fileReverter.deleteLater()
         del self.fileReverter
         Application.setBatchmode(False)
@@ -216,162 +251,365 @@ class ODD(Extension):
         cls.updateActiveDocument()
         
         if hadFocus != cls.kritaHasFocus:
-            if cls.kritaHasFocus:
-                ODDImageChangeDetector.removeStopper(ODDImageChangeDetector.StopReasonBlur)
-                for docker in cls.dockers:
-                        docker.processDeferredDocumentThumbnails()
-                ODDImageChangeDetector.startCooldown()
-            else:
-                ODDImageChangeDetector.addStopper(ODDImageChangeDetector.StopReasonBlur)
+            ODDIdleGovernor.updateState()
     
     @classmethod
-    def viewCreated(cls):
+    def viewCreated(cls, view):
         logger.info("ODD:viewCreated")
         
-        appViews = Application.views()
-        for view in appViews:
-            if view in cls.views:
-                #logger.debug("existing view %s", view)
-                pass
-            else:
-                logger.debug("new view: %s", view)
-                cls.views.append(view)
-        # ~ logger.debug(" - views - ")
-        # ~ for i in enumerate(cls.views):
-            # ~ logger.debug("%s: %s", i[0], i[1])
+        cls.wakeDocStatePoll()
+        
+        if cls.startupPhase:
+            cls.startupIdleTimer.start()
+        
+        doc = view.document()
+        isNewDoc = bool(doc) and not cls.docDataFromDocument(doc)
         
-        cls.updateDocumentsFromViews()
+        if not cls.addView(view):
+            # couldn't place the new view (eg. no window yet), do it the long way.
+            cls.updateDocumentsFromViews()
         
+        if isNewDoc and (docData := cls.docDataFromDocument(doc)):
+            ODDImageChangeDetector.documentCreated(docData)
+        
+        # the view's canvas widget is created a moment later.
+        if win := view.window():
+            qwin = win.qwindow()
+            QTimer.singleShot(0, lambda: ODDIdleGovernor.watchCanvases(qwin))
+        
+        cls.viewsChanged()
+    
+    @classmethod
+    def endStartupPhase(cls):
+        """
+        krita has gone quiet after starting up. dockers only made placeholder
+        items until now, so generate thumbnails for the visible ones.
+        """
+        logger.info("ODD: startup finished.")
+        cls.startupPhase = False
+        ODDImageChangeDetector.rememberUndoStacks()
         for docker in cls.dockers:
-            # ensure list shows no-win-in-view icons as appropriate.
-            docker.list._isItemsToDrawDirty = True
-            docker.list.viewport().update()
+            docker.processDeferredDocumentThumbnails()
     
     @classmethod
     def viewClosed(cls, view):
-        # must wait a little for krita to remove closed view from it's list of views.
+        # must wait a little for krita to finish closing the view,
+        # but the view can only be identified while it still exists.
         d = view.document()
         logger.info("viewClosed %s %s", view, (str(d) + Path(d.fileName()).name) if d else "")
+        if entry := cls.findViewEntry(view):
+            docData = cls.docDataById.get(entry.docId)
+            if docData and docData.lastViewInWindow.get(entry.qwin) == view:
+                logger.debug("a closed view was latest active view on doc %s in its window.", docData.document)
+                docData.lastViewInWindow[entry.qwin] = None
+            cls.closedViewEntries.append(entry)
+        else:
+            logger.debug("viewClosed: view was not registered, resync all views.")
+            cls.viewsNeedResync = True
         cls.viewClosedDelay.start()
     
     @classmethod
     def _viewClosed(cls):
         logger.debug("_viewClosed")
         
-        closedViews = []
-        appViews = Application.views()
-        for view in cls.views:
-            if view in appViews:
-                #logger.debug("kept view %s", view)
-                pass
-            else:
-                logger.debug("closed view: %s", view)
-                closedViews.append(view)
-        for view in closedViews:
-            cls.views.remove(view)
-        # ~ logger.debug(" - views - ")
-        # ~ for i in enumerate(cls.views):
-            # ~ logger.debug("%s: %s", i[0], i[1])
-        
-        for docData in cls.documents:
-            for k,v in docData["lastViewInWindow"].items():
-                logger.debug(v)
-                if v not in cls.views:
-                    logger.debug("a closed view was latest active view on doc %s in its window.", docData["document"])
-                    docData["lastViewInWindow"][k] = None
+        for entry in cls.closedViewEntries:
+            logger.debug("closed view: %s", entry.view)
+            cls.removeViewEntry(entry)
+        cls.closedViewEntries.clear()
         
-        cls.updateDocumentsFromViews()
+        if cls.viewsNeedResync:
+            cls.viewsNeedResync = False
+            cls.updateDocumentsFromViews()
         
+        cls.viewsChanged()
+    
+    @classmethod
+    def viewsChanged(cls):
+        cls.wakeDocStatePoll()
         for docker in cls.dockers:
             if docker.filtButton.isChecked():
                 docker.toggleDockerFiltering()
             # ensure list shows no-win-in-view icons as appropriate.
-            docker.list._isItemsToDrawDirty = True
-            docker.list.viewport().update()
+            docker.list.scheduleUpdate(ODDListWidget.DirtyDrawList)
+        cls.infoChanged()
     
     @classmethod
-    def updateDocumentsFromViews(cls):
-        docStillExists = [False] * len(cls.documents)
+    def viewActivated(cls, qwin, view):
+        """
+        remember which registered view is active in a window.
+        """
+        cls.activeViewIdInWindow[qwin] = None
+        docData = cls.docDataFromDocument(view.document()) if view else None
+        if not docData:
+            return
+        for viewId in docData.viewIdsInWindow.get(qwin, ()):
+            if cls.views[viewId].view == view:
+                cls.activeViewIdInWindow[qwin] = viewId
+                return
+    
+    @classmethod
+    def viewsOfDocumentInWindow(cls, docData, qwin):
+        """
+        views of the document in the window, in the order they were created.
+        """
+        return [cls.views[viewId].view for viewId in docData.viewIdsInWindow.get(qwin, ())]
+    
+    @classmethod
+    def findViewEntry(cls, view):
+        doc = view.document()
+        docData = cls.docDataFromDocument(doc) if doc else None
+        if docData:
+            for viewId in docData.viewIds:
+                if cls.views[viewId].view == view:
+                    return cls.views[viewId]
+        # the view may have been given a different document (eg. file revert).
+        return next((entry for entry in cls.views.values() if entry.view == view), None)
+    
+    @classmethod
+    def addView(cls, view):
+        """
+        register a single view, and its document if it's new.
+        returns False if the view can't be placed yet.
+        """
+        doc = view.document()
+        win = view.window()
+        if not doc:
+            logger.debug("addView: no doc for view")
+            return False
+        if not win:
+            return False
+        qwin = win.qwindow()
         
+        isNewDoc = False
+        if docData := cls.docDataFromDocument(doc):
+            if any(cls.views[viewId].view == view for viewId in docData.viewIds):
+                #logger.debug("existing view %s", view)
+                return True
+        else:
+            docData = cls.addDocument(doc)
+            isNewDoc = True
+        
+        logger.debug("new view: %s", view)
+        entry = ODDViewEntry(cls.nextViewId, view, docData.id, qwin)
+        cls.nextViewId += 1
+        cls.views[entry.id] = entry
+        docData.viewIds.add(entry.id)
+        docData.viewIdsInWindow.setdefault(qwin, []).append(entry.id)
+        docData.viewCountPerWindow[qwin] = docData.viewCountPerWindow.get(qwin, 0) + 1
+        if win.activeView() == view:
+            cls.activeViewIdInWindow[qwin] = entry.id
+        #logger.debug("doc {} has {} views in {}".format(docData.document, docData.viewCountPerWindow[qwin], qwin.objectName()))
+        
+        if isNewDoc:
+            docData.lastViewInWindow[qwin] = view
+            for docker in cls.dockers:
+                docker.documentCreated(doc)
+        return True
+    
+    @classmethod
+    def removeViewEntry(cls, entry):
+        if cls.views.pop(entry.id, None) is None:
+            return
+        docData = cls.docDataById.get(entry.docId)
+        if not docData:
+            return
+        docData.viewIds.discard(entry.id)
+        if entry.id in docData.viewIdsInWindow.get(entry.qwin, ()):
+            docData.viewIdsInWindow[entry.qwin].remove(entry.id)
+        if docData.viewCountPerWindow.get(entry.qwin, 0) > 0:
+            docData.viewCountPerWindow[entry.qwin] -= 1
+        if cls.activeViewIdInWindow.get(entry.qwin) == entry.id:
+            cls.activeViewIdInWindow[entry.qwin] = None
+        if not docData.viewIds:
+            cls.removeDocument(docData)
+    
+    @classmethod
+    def addDocument(cls, doc):
+        logger.info("new doc: %s", doc)
+        docData = ODDDocData(doc, [win.qwindow() for win in cls.windows], cls.nextDocId)
+        cls.nextDocId += 1
+        docData.key = cls.documentKey(doc)
+        docData.displayName = cls.documentDisplayName(doc)
+        cls.documents.append(docData)
+        cls.docDataById[docData.id] = docData
+        cls.docIdByKey[docData.key] = docData.id
+        if cls.activeDocId is None and cls.activeDocument and doc == cls.activeDocument:
+            cls.activeDocId = docData.id
+        logger.debug("\n".join("  {}: {}".format(k, getattr(docData, k)) for k in ODDDocData.__slots__))
+        cls.infoChanged()
+        return docData
+    
+    @classmethod
+    def removeDocument(cls, docData):
+        logger.info("doc removed: %s (%s)", docData.document, docData.document.fileName())
+        for docker in cls.dockers:
+            docker.documentClosed(docData.document)
+        # ensure it will be removed from ODDImageChangeDetector changed docs.
+        ODDImageChangeDetector.forgetDocument(docData)
+        # account for any leftover thumbs.
+        for thumbKey,thumbData in docData.thumbnails.items():
+            pm = thumbData.pixmap
+            logger.debug("doc {}: removing thumb {} with size {}".format(
+                docData.document, thumbKey, thumbData.size
+            ))
+            cls.unusedCacheSize -= thumbData.size
+        cls.documents.remove(docData)
+        del cls.docDataById[docData.id]
+        if cls.docIdByKey.get(docData.key) == docData.id:
+            del cls.docIdByKey[docData.key]
+        if cls.activeDocId == docData.id:
+            cls.activeDocId = None
+        if len(cls.documents) == 0:
+            cls.updateActiveDocument()
+        cls.infoChanged()
+    
+    @classmethod
+    def updateDocumentsFromViews(cls):
+        """
+        rebuild the view registry from scratch. views are normally added and
+        removed one at a time as they are created and closed, but a view can
+        change document without either happening (eg. file revert).
+        """
+        cls.views.clear()
+        cls.activeViewIdInWindow.clear()
         for docData in cls.documents:
-            for w in docData["viewCountPerWindow"]:
-                docData["viewCountPerWindow"][w] = 0
+            docData.viewIds.clear()
+            for w in docData.viewIdsInWindow:
+                docData.viewIdsInWindow[w] = []
+            for w in docData.viewCountPerWindow:
+                docData.viewCountPerWindow[w] = 0
         
-        for view in cls.views:
-            doc = view.document()
-            win = view.window()
-            if not win:
-                continue
-            qwin = win.qwindow()
-            if not doc:
-                logger.debug("UpdateDocsAndWins: no doc for view")
+        for view in Application.views():
+            cls.addView(view)
+        
+        for docData in [docData for docData in cls.documents if not docData.viewIds]:
+            cls.removeDocument(docData)
+    
+    @classmethod
+    def pollDocumentStates(cls):
+        """
+        snapshot the modified status, size and name of every document once per
+        tick, and let the dockers know about whatever changed since last time.
+        """
+        if hasattr(cls.instance, "fileReverter"):
+            logger.debug("reverting, skip")
+            return
+        
+        if not any(docker.dockVisible for docker in cls.dockers):
+            # nothing to show the states in, sleep until a docker is shown.
+            cls.docStatePollTimer.stop()
+            return
+        
+        changes = {}
+        for docData in cls.documents:
+            doc = docData.document
+            size = (doc.width(), doc.height())
+            if size == (0, 0):
+                logger.info("ODD.pollDocumentStates: closed document %s still registered, skip.", docData)
                 continue
-            if matchList := [i for i in enumerate(cls.documents) if i[1]["document"] == doc]:
-                knownDoc = matchList[0]
-                docStillExists[knownDoc[0]] = True
-                docData = knownDoc[1]
-                if qwin in docData["viewCountPerWindow"]:
-                    docData["viewCountPerWindow"][qwin] += 1
-                else:
-                    docData["viewCountPerWindow"][qwin] = 1
-                #logger.debug("existing doc {} has {} views in {}".format(docData["document"], docData["viewCountPerWindow"][qwin], qwin.objectName()))
-            else:
-                logger.info("new doc: %s", doc)
-                cls.documents.append({
-                    "document": doc,
-                    "thumbnails": {},
-                    "created": datetime.now(),
-                    "lastViewInWindow": {win.qwindow():None for win in cls.windows},
-                    "viewCountPerWindow": {win.qwindow():0 for win in cls.windows},
-                })
-                cls.documents[-1]["lastViewInWindow"  ][qwin] = view
-                cls.documents[-1]["viewCountPerWindow"][qwin] = 1
-                logger.debug("\n".join("  {}: {}".format(k, v) for k,v in cls.documents[-1].items()))
-                for docker in cls.dockers:
-                    docker.documentCreated(doc)
-        
-        # ~ logger.debug("docStillExists:")
-        # ~ for i in enumerate(docStillExists):
-            # ~ logger.debug("%s: %s", i[0], i[1])
-        
-        i = 0
-        while i < len(docStillExists):
-            if not docStillExists[i]:
-                logger.info("doc removed: %s (%s)", cls.documents[i]["document"], cls.documents[i]["document"].fileName())
-                for docker in cls.dockers:
-                    docker.documentClosed(cls.documents[i]["document"])
-                # ensure it will be removed from ODDImageChangeDetector list of changed docs.
-                if matchList := [cd for cd in enumerate(ODDImageChangeDetector.changedDocs) if cd[1]["docData"]["document"] == cls.documents[i]["document"]]:
-                    logger.debug("Deleting entry of ODDImageChangeDetector.changedDocs at index %s", matchList[0][0])
-                    if ODDImageChangeDetector.changedDoc == matchList[0][1]:
-                        logger.debug("and remove as current changedDoc")
-                        ODDImageChangeDetector.changedDoc = None
-                    del ODDImageChangeDetector.changedDocs[matchList[0][0]]
-                # account for any leftover thumbs.
-                for thumbKey,thumbData in cls.documents[i]["thumbnails"].items():
-                    pm = thumbData["pixmap"]
-                    logger.debug("doc {}: removing thumb {} with size {}".format(
-                        cls.documents[i]["document"], thumbKey, thumbData["size"]
-                    ))
-                    cls.unusedCacheSize -= thumbData["size"]
-                del cls.documents[i]
-                del docStillExists[i]
-                if len(cls.documents) == 0:
-                    cls.updateActiveDocument()
-            else:
-                i += 1
+            what = 0
+            modified = doc.modified()
+            if modified != docData.stateModified:
+                docData.stateModified = modified
+                what |= cls.DocStateModified
+                if modified:
+                    # an edit, whether or not the change detector is running.
+                    docData.generation += 1
+            if size != docData.stateSize:
+                docData.stateSize = size
+                what |= cls.DocStateSize
+            fileName = doc.fileName()
+            if fileName != docData.stateFileName:
+                docData.stateFileName = fileName
+                what |= cls.DocStateName
+            if what & (cls.DocStateModified | cls.DocStateName):
+                name = cls.documentDisplayName(doc)
+                if name != docData.displayName:
+                    docData.displayName = name
+                    what |= cls.DocStateName
+            if what:
+                changes[docData.id] = what
+        
+        for docker in cls.dockers:
+            docker.documentStatesChanged(changes)
+        if changes:
+            cls.infoChanged()
+        
+        # keep polling while something may still change by itself: a busy
+        # document, a pending change check, or a document without an undo
+        # stack to hear its edits through.
+        if changes or ODDImageChangeDetector.changedDocs or any(
+                docData.undoStack is None or cls.documentIsBusy(docData.document)
+                for docData in cls.documents
+        ):
+            cls.docStatePollQuietTicks = 0
+            return
+        cls.docStatePollQuietTicks += 1
+        if cls.docStatePollQuietTicks >= cls.docStatePollQuietLimit:
+            logger.debug("ODD.pollDocumentStates: nothing happening, sleep.")
+            cls.docStatePollTimer.stop()
+    
+    @classmethod
+    def wakeDocStatePoll(cls):
+        """
+        something may have changed the state of a document, poll until things
+        have been quiet for a few ticks.
+        """
+        if not cls.docStatePollTimer:
+            return
+        cls.docStatePollQuietTicks = 0
+        ODDIdleGovernor.wakeTimer(cls.docStatePollTimer)
+    
+    @classmethod
+    def infoChanged(cls):
+        """
+        something shown in the dockers' info views has changed.
+        """
+        for docker in cls.dockers:
+            docker.infoViewChanged()
     
     @classmethod
     def updateActiveDocument(cls):
         cls.activeDocument = Application.activeDocument()
+        activeDocData = cls.docDataFromDocument(cls.activeDocument)
+        cls.activeDocId = activeDocData.id if activeDocData else None
         logger.debug("ODD.activeDocument -> %s", cls.activeDocument.fileName() if type(cls.activeDocument) is Document else "None")
         ODDImageChangeDetector.activeDocumentChanged()
+        cls.wakeDocStatePoll()
+    
+    @classmethod
+    def documentKey(cls, doc):
+        """
+        libkis makes a new Document wrapper every time, so key documents by
+        the uuid of their root node instead.
+        """
+        root = doc.rootNode()
+        return root.uniqueId().toString() if root else None
     
     @classmethod
     def docDataFromDocument(cls, doc):
-        return next(
-                filter(lambda docData: docData["document"] == doc, cls.documents), None
+        if not doc:
+            return None
+        key = cls.documentKey(doc)
+        if (docId := cls.docIdByKey.get(key)) is not None:
+            docData = cls.docDataById[docId]
+            if docData.document == doc:
+                return docData
+        # key unknown or stale (eg. root node replaced), fall back to searching.
+        docData = next(
+                filter(lambda docData: docData.document == doc, cls.documents), None
         )
+        if docData and key is not None:
+            logger.debug("docDataFromDocument: rekey %s", docData)
+            if cls.docIdByKey.get(docData.key) == docData.id:
+                del cls.docIdByKey[docData.key]
+            docData.key = key
+            cls.docIdByKey[key] = docData.id
+        return docData
+    
+    @classmethod
+    def docDataFromId(cls, docId):
+        return cls.docDataById.get(docId)
     
     @classmethod
     def requestThumbnail(cls, docData, thumbKey, forceNotProgressive=False):
@@ -381,30 +619,32 @@ class ODD(Extension):
             if (docData := cls.docDataFromDocument(docData)) is None:
                 return None
         
-        logger.debug("requestThumbnail: doc: %s", docData["document"].fileName())
+        logger.debug("requestThumbnail: doc: %s", docData.document.fileName())
         logger.debug("                  thKey: %s", thumbKey)
         logger.debug("                  fnPrg: %s", forceNotProgressive)
         
         isNew = False
-        if not thumbKey in docData["thumbnails"]:
+        if not thumbKey in docData.thumbnails:
             isNew = True
-            docData["thumbnails"][thumbKey] = {"pixmap":None, "valid":False, "users":[], "lastUsed":0, "generator":None, "size":0}
+            docData.thumbnails[thumbKey] = ODDThumbEntry()
         
-        thumb = docData["thumbnails"][thumbKey]
+        thumb = docData.thumbnails[thumbKey]
         
-        if thumb["valid"]:
-            if thumb["pixmap"] and not thumb["generator"]:
-                logger.debug("requestThumbnail: existing thumb is valid, returning pixmap %s", thumb["pixmap"])
-                return thumb["pixmap"]
+        if thumb.valid:
+            if thumb.pixmap and not thumb.generator:
+                logger.debug("requestThumbnail: existing thumb is valid, returning pixmap %s", thumb.pixmap)
+                return thumb.pixmap
             else:
                 logger.debug("requestThumbnail: existing thumb is valid but pixmap is blank or still being generated, returning closest valid pixmap.")
-                candidatePm = cls.closestValidThumbnailPixmap(docData["thumbnails"], thumbKey)
+                candidatePm = cls.closestValidThumbnailPixmap(docData.thumbnails, thumbKey)
                 if candidatePm:
                     return QPixmap(candidatePm)
                 else:
                     return None
         
-        oldPm = thumb["pixmap"]
+        oldPm = thumb.pixmap
+        thumb.generation = docData.generation
+        thumb.madeUnmodified = not docData.document.modified()
         
         # check if should generate thumb progressively.
         # (checks include if thumb would only require one block, in which case prog' gen' is unnecessary.)
@@ -412,44 +652,45 @@ class ODD(Extension):
                 ODDSettings.globalSettingValue("thumbUseProjectionMethod")
                 and ODDSettings.globalSettingValue("progressiveThumbs")
                 and not forceNotProgressive
-                and docData["document"].width() * docData["document"].height() > (
+                and docData.document.width() * docData.document.height() > (
                     ODDSettings.globalSettingValue("progressiveThumbsWidth") * ODDSettings.globalSettingValue("progressiveThumbsHeight")
                 )
         )
         
         if progressive:
-            thumb["generator"] = ODDThumbGenerator(
-                docData["document"], thumbKey[0], thumbKey[1],
-                finishedCallback = lambda otgPixmap: cls.thumbGeneratorFinished(thumb, thumbKey, otgPixmap)
+            thumb.generator = ODDThumbGenerator(
+                docData.document, thumbKey[0], thumbKey[1],
+                finishedCallback = lambda otgPixmap: cls.thumbGeneratorFinished(docData, thumb, thumbKey, otgPixmap)
             )
-            thumb["generator"].start()
+            thumb.generator.start()
             if oldPm:
                 pm = oldPm
             else:
                 # try to find the nearest-size valid pixmap, if there is one, before falling back to blank.
-                candidatePm = cls.closestValidThumbnailPixmap(docData["thumbnails"], thumbKey)
+                candidatePm = cls.closestValidThumbnailPixmap(docData.thumbnails, thumbKey)
                 if candidatePm:
                     pm = QPixmap(candidatePm)
                 else:
                     pm = None
-            thumb["size"] = thumbKey[0] * thumbKey[1] * QPixmap.defaultDepth()
+            thumb.size = thumbKey[0] * thumbKey[1] * QPixmap.defaultDepth()
         else:
-            img = cls.generateThumbnail(docData["document"], thumbKey[0], thumbKey[1], thumbKey[2], thumbKey[3])
+            img = cls.generateThumbnail(docData.document, thumbKey[0], thumbKey[1], thumbKey[2], thumbKey[3])
             pm = QPixmap.fromImage(img)
-            thumb["size"] =  pm.width() * pm.height() * QPixmap.defaultDepth()
+            thumb.size =  pm.width() * pm.height() * QPixmap.defaultDepth()
         
-        thumb["pixmap"] = pm
-        thumb["valid"] = True
-        thumb["lastUsed"] = process_time_ns()
+        thumb.pixmap = pm
+        thumb.valid = True
+        thumb.lastUsed = monotonic_ns()
         
         cls.evictExcessUnusedCache()
         
         if isNew:
-            cls.unusedCacheSize += thumb["size"]
+            cls.unusedCacheSize += thumb.size
         
         if not progressive:
-            cls.updatePixmapInDockers(docData["document"], thumbKey, oldPm, pm)
-        return thumb["pixmap"]
+            cls.updatePixmapInDockers(docData, thumbKey, oldPm, pm)
+        cls.infoChanged()
+        return thumb.pixmap
     
     @classmethod
     def closestValidThumbnailPixmap(cls, thumbs, thumbKey):
@@ -459,20 +700,20 @@ class ODD(Extension):
         candidateIsLarger = False # prefer too-big valid thumbnails to too-small.
         for k,v in thumbs.items():
             if k != thumbKey:
-                if v["valid"] and v["pixmap"] and not v["generator"]:
+                if v.valid and v.pixmap and not v.generator:
                     wdiff = thumbKey[0]-k[0]
                     if abs(wdiff) < candidateWidthDiff:
                         if wdiff < 0 or not candidateIsLarger:
-                            candidatePm = v["pixmap"]
+                            candidatePm = v.pixmap
                             candidateWidthDiff = wdiff
                             candidateIsLarger = wdiff < 0
         logger.debug("found (error in width = {} px).".format(candidateWidthDiff) if candidatePm else "not found.")
         return candidatePm
     
     @classmethod
-    def updatePixmapInDockers(cls, doc, thumbKey, oldPixmap, newPixmap):
+    def updatePixmapInDockers(cls, docData, thumbKey, oldPixmap, newPixmap):
         """tell docker instances to use new pixmap if using old one."""
-        logger.debug("updatePixmapInDockers: doc: %s", doc.fileName())
+        logger.debug("updatePixmapInDockers: doc: %s", docData.document.fileName())
         logger.debug("                       thKey: %s", thumbKey)
         # ~ logger.debug("                       oldPm: %s", oldPixmap)
         # ~ logger.debug("                       newPm: %s", newPixmap)
@@ -482,23 +723,23 @@ class ODD(Extension):
         for docker in cls.dockers:
             if docker.vs.settingValue("display", True) != "thumbnails":
                 continue
-            for i in range(docker.list.count()):
-                item = docker.list.item(i)
-                itemDoc = item.data(docker.ItemDocumentRole)
-                itemKey = item.data(docker.ItemThumbnailKeyRole)
-                if not (itemDoc == doc and itemKey == thumbKey):
-                    continue
-                logger.debug("updatePixmapInDockers: itemDoc==doc and itemKey==thumbKey")
-                if oldPixmap:
-                    itemPm = item.data(Qt.DecorationRole)
-                    logger.debug("updatePixmapInDockers: itemPm: %s", itemPm)
-                    if itemPm:
-                        itemPmCacheKey = itemPm.cacheKey()
-                        logger.debug("%s %s: compare %s with %s", i, item, itemPmCacheKey, oldPixmapCacheKey)
-                        if not itemPmCacheKey == oldPixmapCacheKey:
-                            continue
-                logger.debug("update docker of %s item %s with updated thumb.", docker.parent().objectName(), item)
-                item.setData(Qt.DecorationRole, newPixmap)
+            item = docker.findItemWithDocId(docData.id)
+            if not item:
+                continue
+            itemKey = item.data(docker.ItemThumbnailKeyRole)
+            if not itemKey == thumbKey:
+                continue
+            logger.debug("updatePixmapInDockers: itemKey==thumbKey")
+            if oldPixmap:
+                itemPm = item.data(Qt.DecorationRole)
+                logger.debug("updatePixmapInDockers: itemPm: %s", itemPm)
+                if itemPm:
+                    itemPmCacheKey = itemPm.cacheKey()
+                    logger.debug("%s: compare %s with %s", item, itemPmCacheKey, oldPixmapCacheKey)
+                    if not itemPmCacheKey == oldPixmapCacheKey:
+                        continue
+            logger.debug("update docker of %s item %s with updated thumb.", docker.parent().objectName(), item)
+            item.setData(Qt.DecorationRole, newPixmap)
     
     def generateThumbnail(doc, thumbWidth, thumbHeight, regionWidth, regionHeight):
         if type(doc) == Document and ODDSettings.readSettingFromConfig("thumbUseProjectionMethod") == "true":
@@ -513,13 +754,14 @@ class ODD(Extension):
             return doc.thumbnail(thumbWidth, thumbHeight)
     
     @classmethod
-    def thumbGeneratorFinished(cls, thumbData, thumbKey, thumbPixmap):
-        oldPm = thumbData["pixmap"]
-        logger.debug("thumbGeneratorFinished: %s %s", thumbData["generator"].doc.fileName(), thumbKey)
+    def thumbGeneratorFinished(cls, docData, thumbData, thumbKey, thumbPixmap):
+        oldPm = thumbData.pixmap
+        logger.debug("thumbGeneratorFinished: %s %s", thumbData.generator.doc.fileName(), thumbKey)
         thumbPixmap.setDevicePixelRatio(cls.dockers[0].devicePixelRatioF())
-        thumbData["pixmap"] = thumbPixmap
-        cls.updatePixmapInDockers(thumbData["generator"].doc, thumbKey, oldPm, thumbPixmap)
-        thumbData["generator"] = None
+        thumbData.pixmap = thumbPixmap
+        cls.updatePixmapInDockers(docData, thumbKey, oldPm, thumbPixmap)
+        thumbData.generator = None
+        cls.infoChanged()
     
     @classmethod
     def invalidateThumbnails(cls, docData):
@@ -527,22 +769,23 @@ class ODD(Extension):
         if type(docData) == Document:
             if (docData := cls.docDataFromDocument(docData)) is None:
                 return
-        for thumbData in docData["thumbnails"].values():
-            if thumbData["generator"]:
-                thumbData["generator"].stop()
-                thumbData["generator"] = None
-            thumbData["valid"] = False
+        for thumbData in docData.thumbnails.values():
+            if thumbData.generator:
+                thumbData.generator.stop()
+                thumbData.generator = None
+            thumbData.valid = False
         
         cls.cleanupUnusedInvalidatedThumbnails(docData)
+        cls.infoChanged()
         
     @classmethod
     def cleanupUnusedInvalidatedThumbnails(cls, docData):
-        thumbs = docData["thumbnails"]
+        thumbs = docData.thumbnails
         for thumbData in thumbs.values():
-            if not thumbData["valid"] and len(thumbData["users"]) == 0:
-                pm = thumbData["pixmap"]
-                cls.unusedCacheSize -= thumbData["size"]
-        [thumbs.pop(t, None) for t in [t[0] for t in thumbs.items() if t[1]["valid"] == False and len(t[1]["users"]) == 0]]
+            if not thumbData.valid and len(thumbData.users) == 0:
+                pm = thumbData.pixmap
+                cls.unusedCacheSize -= thumbData.size
+        [thumbs.pop(t, None) for t in [t[0] for t in thumbs.items() if t[1].valid == False and len(t[1].users) == 0]]
     
     @classmethod
     def addThumbnailUser(cls, who, docData, thumbKey):
@@ -550,12 +793,13 @@ class ODD(Extension):
         if type(docData) == Document:
             if (docData := cls.docDataFromDocument(docData)) is None:
                 return
-        thumbData = docData["thumbnails"][thumbKey]
-        if not who in thumbData["users"]:
-            thumbData["users"].append(who)
-            if len(thumbData["users"]) == 1:
-                pm = thumbData["pixmap"]
-                cls.unusedCacheSize -= thumbData["size"]
+        thumbData = docData.thumbnails[thumbKey]
+        if not who in thumbData.users:
+            thumbData.users.append(who)
+            if len(thumbData.users) == 1:
+                pm = thumbData.pixmap
+                cls.unusedCacheSize -= thumbData.size
+            cls.infoChanged()
     
     @classmethod
     def removeThumbnailUser(cls, who, docData, thumbKey):
@@ -563,22 +807,23 @@ class ODD(Extension):
         if type(docData) == Document:
             if (docData := cls.docDataFromDocument(docData)) is None:
                 return
-        thumbData = docData["thumbnails"][thumbKey]
-        if not who in thumbData["users"]:
+        thumbData = docData.thumbnails[thumbKey]
+        if not who in thumbData.users:
             return
-        thumbData["users"].remove(who)
-        if len(thumbData["users"]) == 0:
-            if thumbData["generator"]:
-                thumbData["generator"].stop()
-                thumbData["generator"] = None
-            if thumbData["valid"]:
-                pm = thumbData["pixmap"]
-                cls.unusedCacheSize += thumbData["size"]
-                thumbData["lastUsed"] = process_time_ns()
+        thumbData.users.remove(who)
+        if len(thumbData.users) == 0:
+            if thumbData.generator:
+                thumbData.generator.stop()
+                thumbData.generator = None
+            if thumbData.valid:
+                pm = thumbData.pixmap
+                cls.unusedCacheSize += thumbData.size
+                thumbData.lastUsed = monotonic_ns()
                 cls.evictExcessUnusedCache()
             else:
                 logger.debug("removed last user of invalidated thumb, deleting thumb.")
-                del docData["thumbnails"][thumbKey]
+                del docData.thumbnails[thumbKey]
+        cls.infoChanged()
         
     
     @classmethod
@@ -592,29 +837,30 @@ class ODD(Extension):
         logger.debug("before: unused cache size: %s, max allowed: %s, excess: %s", cls.unusedCacheSize, maxSize, cls.unusedCacheSize-maxSize)
         evictableThumbs = []
         for d in cls.documents:
-            for t in d["thumbnails"].items():
-                if len(t[1]["users"]) == 0:
+            for t in d.thumbnails.items():
+                if len(t[1].users) == 0:
                     evictableThumbs.append((d, t[0], t[1]))
         if len(evictableThumbs) == 0:
             logger.debug(" - nothing to evict - ")
             return
-        evictableThumbsSorted = sorted(evictableThumbs, key = lambda e: e[2]["lastUsed"])
+        evictableThumbsSorted = sorted(evictableThumbs, key = lambda e: e[2].lastUsed)
         logger.debug("evictable thumbs:")
         i = 1
         for e in evictableThumbsSorted:
-            logger.debug("#%s: doc %s, tKey: %s (lu: %s)", i, e[0]["document"], e[1], e[2]["lastUsed"])
+            logger.debug("#%s: doc %s, tKey: %s (lu: %s)", i, e[0].document, e[1], e[2].lastUsed)
             i += 1
         while cls.unusedCacheSize > maxSize:
             e = evictableThumbsSorted[0]
-            pm = e[2]["pixmap"]
-            size = e[2]["size"]
-            logger.debug("evicting: %s %s...", e[0]["document"], e[1])
-            del e[0]["thumbnails"][e[1]]
+            pm = e[2].pixmap
+            size = e[2].size
+            logger.debug("evicting: %s %s...", e[0].document, e[1])
+            del e[0].thumbnails[e[1]]
             del evictableThumbsSorted[0]
             cls.unusedCacheSize -= size
             logger.debug("removed %s - excess remaining: %s", size, cls.unusedCacheSize-maxSize)
         logger.debug("result: unused cache size: %s, max allowed: %s, excess: %s", cls.unusedCacheSize, maxSize, cls.unusedCacheSize-maxSize)
         logger.debug(" - evict finished - ")
+        cls.infoChanged()
     
     @classmethod
     def findAndActivateView(cls, doc):
@@ -629,7 +875,7 @@ class ODD(Extension):
     
     def documentHasViewsInWindow(doc, win):
         docData = ODD.docDataFromDocument(doc)
-        return docData["viewCountPerWindow"][win.qwindow()] > 0
+        return docData.viewCountPerWindow[win.qwindow()] > 0
     
     @classmethod
     def windowFromQWindow(cls, qwin):
@@ -649,6 +895,16 @@ class ODD(Extension):
     def thumbnailKey(thumbWidth, thumbHeight, regionWidth, regionHeight):
         return (thumbWidth, thumbHeight, regionWidth, regionHeight)
     
+    def documentIsBusy(doc):
+        """
+        true if krita is working on the document (eg. running a filter).
+        unlike waitForDone, doesn't block.
+        """
+        if doc.tryBarrierLock():
+            doc.unlock()
+            return False
+        return True
+    
     def documentDisplayName(doc, showIfModified=True, unsavedName="[not saved]"):
         if doc:
             fPath = doc.fileName()
@@ -668,6 +924,9 @@ class ODD(Extension):
     def windowCreated(self):
         cls = self.__class__
         
+        if cls.startupPhase:
+            cls.startupIdleTimer.start()
+        
         appWins = Application.windows()
         for win in appWins:
             if win in cls.windows:
@@ -683,12 +942,16 @@ class ODD(Extension):
                 logger.debug("connect window %s activeViewChanged to %s", win, docker)
                 win.activeViewChanged.connect(docker.activeViewChanged)
                 for docData in cls.documents:
-                    if not qwin in docData["lastViewInWindow"]:
-                        #logger.debug("{} was missing lastViewInWindow   for {}".format(docData["document"], qwin.objectName()))
-                        docData["lastViewInWindow"][qwin] = None
-                    if not qwin in docData["viewCountPerWindow"]:
-                        #logger.debug("{} was missing viewCountPerWindow for {}".format(docData["document"], qwin.objectName()))
-                        docData["viewCountPerWindow"][qwin] = sum(v.document()==docData["document"] for v in win.views())
+                    if not qwin in docData.lastViewInWindow:
+                        #logger.debug("{} was missing lastViewInWindow   for {}".format(docData.document, qwin.objectName()))
+                        docData.lastViewInWindow[qwin] = None
+                    if not qwin in docData.viewIdsInWindow:
+                        docData.viewIdsInWindow[qwin] = [viewId for viewId in docData.viewIds if cls.views[viewId].qwin == qwin]
+                    if not qwin in docData.viewCountPerWindow:
+                        #logger.debug("{} was missing viewCountPerWindow for {}".format(docData.document, qwin.objectName()))
+                        docData.viewCountPerWindow[qwin] = sum(cls.views[viewId].qwin == qwin for viewId in docData.viewIds)
+        
+        ODDImageChangeDetector.rememberUndoStacks()
     
     @classmethod
     def eventFilter(cls, obj, event):
@@ -697,6 +960,8 @@ class ODD(Extension):
                 for d in cls.dockers:
                     if d.parent() == obj:
                         d.winGeoChangeResponseDelay.start()
+            elif event.type() in (QEvent.WindowStateChange, QEvent.Show, QEvent.Hide):
+                ODDIdleGovernor.updateState()
         return False
     
     @classmethod
@@ -734,8 +999,8 @@ class ODD(Extension):
                 logger.info("delete ref to docker %s", docker)
                 removeUserBuffer = []
                 for d in cls.documents:
-                    for t in d["thumbnails"].items():
-                        if docker in t[1]["users"]:
+                    for t in d.thumbnails.items():
+                        if docker in t[1].users:
                             removeUserBuffer.append((d, t[0]))
                 for ru in removeUserBuffer:
                     cls.removeThumbnailUser(docker, ru[0], ru[1])
@@ -756,11 +1021,15 @@ class ODD(Extension):
         for docData in cls.documents:
             for win in closedWins:
                 qwin = win.qwindow()
-                logger.debug("remove closed qwin %s data from docData of %s", qwin, docData["document"])
-                if qwin in docData["lastViewInWindow"]:
-                    del docData["lastViewInWindow"][qwin]
-                if qwin in docData["viewCountPerWindow"]:
-                    del docData["viewCountPerWindow"][qwin]
+                logger.debug("remove closed qwin %s data from docData of %s", qwin, docData.document)
+                if qwin in docData.lastViewInWindow:
+                    del docData.lastViewInWindow[qwin]
+                if qwin in docData.viewCountPerWindow:
+                    del docData.viewCountPerWindow[qwin]
+                if qwin in docData.viewIdsInWindow:
+                    del docData.viewIdsInWindow[qwin]
+        for win in closedWins:
+            cls.activeViewIdInWindow.pop(win.qwindow(), None)
         
         # ~ logger.debug("-post-")
         # ~ for i in range(len(cls.dockers)):
@@ -779,3 +1048,6 @@ from .oddsettings import ODDSettings
 from .oddviewprocessor import ODDViewProcessor
 from .oddthumbgenerator import ODDThumbGenerator
 from .oddimagechangedetector import ODDImageChangeDetector
+from .odddocdata import ODDDocData, ODDThumbEntry, ODDViewEntry
+from .oddidlegovernor import ODDIdleGovernor
+from .oddlistwidget import ODDListWidget
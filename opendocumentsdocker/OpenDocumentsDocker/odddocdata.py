@@ -0,0 +1,91 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from sys import getsizeof
+from datetime import datetime
+
+import logging
+logger = logging.getLogger("odd")
+
+
+class ODDThumbEntry:
+    """
+    a cached thumbnail of one document at one size.
+    size is the pixmap size in bits, lastUsed is a monotonic_ns stamp.
+    """
+    __slots__ = ("pixmap", "valid", "users", "lastUsed", "generator", "size", "generation", "madeUnmodified")
+
+    def __init__(self):
+        self.pixmap = None
+        self.valid = False
+        self.users = []
+        self.lastUsed = 0
+        self.generator = None
+        self.size = 0
+        self.generation = 0
+        self.madeUnmodified = False
+
+
+class ODDViewEntry:
+    """
+    a view known to ODD. views can't be hashed, so they are registered
+    under an id of their own.
+    """
+    __slots__ = ("id", "view", "docId", "qwin")
+
+    def __init__(self, viewId, view, docId, qwin):
+        self.id = viewId
+        self.view = view
+        self.docId = docId
+        self.qwin = qwin
+
+
+class ODDDocData:
+    """
+    everything ODD keeps about one open document.
+    """
+    __slots__ = (
+            "id", "key", "document", "thumbnails", "created", "viewIds", "viewIdsInWindow", "lastViewInWindow", "viewCountPerWindow",
+            "undoStack", "undoStackConfirmed",
+            "changeSamples", "skippedChanges", "wasModified", "saveTime", "generation",
+            "stateModified", "stateSize", "stateFileName", "displayName",
+    )
+
+    def __init__(self, doc, qwins, docId):
+        self.id = docId
+        self.key = None
+        self.document = doc
+        self.thumbnails = {}
+        self.created = datetime.now()
+        self.viewIds = set()
+        self.viewIdsInWindow = {qwin:[] for qwin in qwins}
+        self.lastViewInWindow = {qwin:None for qwin in qwins}
+        self.viewCountPerWindow = {qwin:0 for qwin in qwins}
+
+        # change detector state.
+        self.undoStack = None
+        self.undoStackConfirmed = False
+        self.changeSamples = None
+        self.skippedChanges = 0
+        self.wasModified = doc.modified()
+        self.saveTime = 0
+        self.generation = 0
+
+        # last polled state, see ODD.pollDocumentStates.
+        self.stateModified = doc.modified()
+        self.stateSize = (doc.width(), doc.height())
+        self.stateFileName = doc.fileName()
+        self.displayName = ""
+
+    def __repr__(self):
+        return "ODDDocData({}, {})".format(self.id, self.document)
+
+    def memoryUsage(self):
+        """
+        approximate bytes held for this document, thumbnail pixmaps included.
+        """
+        total = getsizeof(self) + getsizeof(self.thumbnails) + getsizeof(self.viewIds) + sum(getsizeof(ids) for ids in self.viewIdsInWindow.values()) + getsizeof(self.lastViewInWindow) + getsizeof(self.viewCountPerWindow)
+        if self.changeSamples:
+            total += getsizeof(self.changeSamples[1])
+        for thumbKey,thumb in self.thumbnails.items():
+            total += getsizeof(thumbKey) + getsizeof(thumb) + getsizeof(thumb.users) + thumb.size // 8
+        return total
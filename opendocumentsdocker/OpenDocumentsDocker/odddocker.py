@@ -1,15 +1,16 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-from PyQt5.QtCore import Qt, QByteArray, QBuffer, QPoint, QSize
+from PyQt5.QtCore import Qt, QPoint, QSize, QSortFilterProxyModel
 from PyQt5.QtGui import QPixmap, QScreen, QContextMenuEvent
-from PyQt5.QtWidgets import QWidget, QBoxLayout, QVBoxLayout, QHBoxLayout, QListView, QPushButton, QMenu, QAbstractItemView, QListWidgetItem, QLabel, QCheckBox, QRadioButton, QButtonGroup, QSlider, QSizePolicy, QStackedLayout, QScrollArea
+from PyQt5.QtWidgets import QWidget, QBoxLayout, QVBoxLayout, QHBoxLayout, QListView, QPushButton, QMenu, QAbstractItemView, QListWidgetItem, QLabel, QCheckBox, QRadioButton, QButtonGroup, QSlider, QSizePolicy, QStackedLayout, QTreeView, QApplication
 from krita import *
 from time import *
 import uuid
-from pathlib import Path
 from .odd import ODD
 from .oddsettings import ODDSettings, convertSettingStringToValue, convertSettingValueToString
 from .oddlistwidget import ODDListWidget
+from .oddtooltip import ODDToolTip
+from .oddinfomodel import ODDInfoModel
 from .multirowboxlayout import MultiRowBoxLayout
 
 import logging
@@ -22,9 +23,17 @@ class ODDDocker(krita.DockWidget):
     ItemModifiedStatusRole = Qt.UserRole+2
     ItemDocumentSizeRole   = Qt.UserRole+3
     ItemThumbnailKeyRole   = Qt.UserRole+4
+    ItemDocumentIdRole     = Qt.UserRole+5
     
     imageChangeDetected = False # todo: make instance attribute, not class?
     
+    # a thumbnail within this fraction of its ideal size is drawn scaled
+    # instead of being regenerated after a resize.
+    thumbRescaleHysteresis = 0.1
+    
+    # ms since the last resize event for a resize to still be going, see isBeingResized.
+    liveResizeTimeout = 500
+    
     def __init__(self):
         logger.debug("ODDDocker: begin init %s", self)
         super(ODDDocker, self).__init__()
@@ -38,12 +47,16 @@ class ODDDocker(krita.DockWidget):
         self.dockVisible = True
         self.visibilityChanged.connect(self.dockVisibilityChanged)
         self.deferredItemThumbnailCount = 0
+        self.itemsByDocId = {}
+        self.createdDocs = []
+        self.liveInteraction = False
+        self.refreshAllExact = False
+        self.busyDocIds = set()
         
         self.baseWidget = QWidget(self)
         self.layout = QBoxLayout(QBoxLayout.TopToBottom)
         self.list = ODDListWidget(ODD.instance, self)
-        self.listToolTip = QLabel(self)
-        self.listToolTip.setWindowFlags(Qt.ToolTip)
+        self.listToolTip = ODDToolTip(self, self.showToolTipForDocId)
         self.buttonWidget = QWidget(self)
         self.buttonLayout = MultiRowBoxLayout(QBoxLayout.LeftToRight)
         self.infoButton = QPushButton(self.baseWidget)
@@ -79,20 +92,25 @@ class ODDDocker(krita.DockWidget):
         
         self.dockerStack = QStackedLayout()
         
-        self.infoScrollArea = QScrollArea()
         self.infoContainer = QWidget()
         self.infoLayout = QVBoxLayout()
-        self.infoLayout.setAlignment(Qt.AlignTop)
+        self.infoLayout.setContentsMargins(0,0,0,0)
         self.infoLabel = QLabel("info.")
         self.infoLayout.addWidget(self.infoLabel)
+        self.infoModel = ODDInfoModel(self)
+        self.infoProxyModel = QSortFilterProxyModel(self)
+        self.infoProxyModel.setSourceModel(self.infoModel)
+        self.infoProxyModel.setSortRole(ODDInfoModel.SortRole)
+        self.infoView = QTreeView()
+        self.infoView.setModel(self.infoProxyModel)
+        self.infoView.setUniformRowHeights(True)
+        self.infoView.setSortingEnabled(True)
+        self.infoView.sortByColumn(ODDInfoModel.ColumnMemory, Qt.DescendingOrder)
+        self.infoLayout.addWidget(self.infoView)
         self.infoContainer.setLayout(self.infoLayout)
-        self.infoScrollArea.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
-        self.infoScrollArea.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-        self.infoScrollArea.setWidgetResizable(True)
-        self.infoScrollArea.setWidget(self.infoContainer)
         
         self.dockerStack.addWidget(self.list)
-        self.dockerStack.addWidget(self.infoScrollArea)
+        self.dockerStack.addWidget(self.infoContainer)
         self.layout.addLayout(self.dockerStack)
         self.layout.setStretch(0, 1)
         
@@ -124,6 +142,7 @@ class ODDDocker(krita.DockWidget):
         self.setWidget(self.baseWidget)
         
         self.lastSize = self.baseWidget.size()
+        self.lastResizeTime = 0
         self.resizeDelay = QTimer(self.baseWidget)
         self.resizeDelay.timeout.connect(self.delayedResize)
         
@@ -137,10 +156,16 @@ class ODDDocker(krita.DockWidget):
         self.refreshAllDelay.setSingleShot(True)
         self.refreshAllDelay.timeout.connect(self.refreshAllDelayTimeout)
         
-        self.itemUpdateTimer = QTimer(self.baseWidget)
-        self.itemUpdateTimer.setInterval(500)
-        self.itemUpdateTimer.timeout.connect(self.itemUpdateTimerTimeout)
-        self.itemUpdateTimer.start()
+        # the info view is only updated when something it shows has changed.
+        self.infoUpdateDelay = QTimer(self.baseWidget)
+        self.infoUpdateDelay.setInterval(250)
+        self.infoUpdateDelay.setSingleShot(True)
+        self.infoUpdateDelay.timeout.connect(self.infoUpdateDelayTimeout)
+        
+        self.busyRetryTimer = QTimer(self.baseWidget)
+        self.busyRetryTimer.setInterval(250)
+        self.busyRetryTimer.setSingleShot(True)
+        self.busyRetryTimer.timeout.connect(self.busyRetryTimerTimeout)
         
         self.loadButton.clicked.connect(self.updateDocumentThumbnailForced)
         self.infoButton.clicked.connect(self.toggleDockerInfoView)
@@ -165,45 +190,31 @@ class ODDDocker(krita.DockWidget):
         return self._window
     
     def itemClicked(self, item):
-        doc = item.data(self.ItemDocumentRole)
-        if not doc:
+        docData = ODD.docDataFromId(item.data(self.ItemDocumentIdRole))
+        if not docData:
             logger.warning("ODD: clicked an item that has no doc, or points to a doc that doesn't exist!")
             return
         
         qwin = self.parent()
-        activeViewThisWindow = None
-        viewsThisWindow = []
-        viewsThisWindowCount = 0
-        viewsOtherWindowsCount = 0
-        for v in ODD.views:
-            vdoc = v.document()
-            if vdoc == doc:
-                if v.window().qwindow() == qwin:
-                    viewsThisWindow.append(v)
-                    viewsThisWindowCount += 1
-                    if v.window().activeView() == v:
-                        activeViewThisWindow = v
-                else:
-                    viewsOtherWindowsCount += 1
+        viewIdsThisWindow = docData.viewIdsInWindow.get(qwin, [])
+        activeViewId = ODD.activeViewIdInWindow.get(qwin)
         
-        if viewsThisWindowCount == 0:
+        if len(viewIdsThisWindow) == 0:
             self.list.contextMenuEvent(
                     QContextMenuEvent(QContextMenuEvent.Mouse, self.list.mapFromGlobal(QCursor.pos())),
                     viewOptionsOnly=True
             )
         else:
-            if activeViewThisWindow is not None:
-                view = viewsThisWindow[
-                        (viewsThisWindow.index(activeViewThisWindow) + 1) % len(viewsThisWindow)
-                ]
+            if activeViewId in viewIdsThisWindow:
+                view = ODD.views[viewIdsThisWindow[
+                        (viewIdsThisWindow.index(activeViewId) + 1) % len(viewIdsThisWindow)
+                ]].view
             else:
-                docData = ODD.docDataFromDocument(doc)
-                if qwin in docData["lastViewInWindow"]:
-                    view = docData["lastViewInWindow"][qwin]
+                view = docData.lastViewInWindow.get(qwin)
                 if not view:
-                    view = viewsThisWindow[0]
+                    view = ODD.views[viewIdsThisWindow[0]].view
             
-            win = view.window()
+            win = self.window()
             win.activate()
             win.showView(view)
             view.setVisible()
@@ -212,56 +223,20 @@ class ODDDocker(krita.DockWidget):
         if not self.vs.settingValue("tooltipShow"):
             return
         
-        doc = item.data(self.ItemDocumentRole)
-        if not doc:
+        self.listToolTip.requestShow(item.data(self.ItemDocumentIdRole))
+    
+    def showToolTipForDocId(self, docId):
+        item = self.itemsByDocId.get(docId)
+        docData = ODD.docDataFromId(docId)
+        if not (item and docData):
             return
-
-        fPath = doc.fileName()
-        
-        sizeMode = self.vs.settingValue("tooltipSizeMode", True)
-        isSmall = sizeMode == "small"
-        isLarge = sizeMode == "large"
-        pad = 0 if isSmall else 16 if isLarge else 4
-        
-        ttText = "<table border='0' style='margin:{}px; padding:{}px'><tr>\n".format(pad, pad)
-        
-        # From answer to "Use a picture or image in a QToolTip": https://stackoverflow.com/a/34300771
-        imgHtml = ""
-        pxCount = doc.width() * doc.height()
-        if pxCount <= self.vs.settingValue("tooltipThumbLimit"):
-            settingSize = self.vs.settingValue("tooltipThumbSize")
-            w = doc.width()
-            h = doc.height()
-            if w > h:
-                size = QSize(settingSize, int(settingSize * (doc.height() / doc.width())))
-            else:
-                size = QSize(int(settingSize * (doc.width() / doc.height())), settingSize)
-            logger.debug("itemEntered: requesting thumbnail...")
-            img = ODD.requestThumbnail(doc, (size.width(), size.height(), doc.width(), doc.height()), forceNotProgressive=True)
-            data = QByteArray()
-            buffer = QBuffer(data)
-            img.save(buffer, "PNG", 100)
-            imgHtml = "<img src='data:image/png;base64, " + str(data.toBase64()).split("'")[1] + "'>"
-        
-        if imgHtml:
-            s = " style='margin:0px; padding:0px'" if not isLarge else ""
-            ttText += "<td{}>\n<table border='{}'><tr><td{}>{}</td></tr></table>\n</td>\n".format(s, "0" if isSmall else "1", s, imgHtml)
-        if isSmall:
-            ttText += "<td valign=middle>"
-            ttText += "<b>{}</b>{}\n".format(ODD.documentDisplayName(doc), "&nbsp;"*3)
-            ttText += "<small>{}</small>{}\n".format(fPath, "&nbsp;"*3)
-            ttText += "<small>{} x {}</small>\n".format(doc.width(), doc.height())
-            ttText += "</td></tr></table>\n"
-        else:
-            h = "h2" if isLarge else "h3"
-            ttText += "<td style='padding-left:{}px'>\n<{} style='margin:0px'>{}</{}>\n".format(
-                    pad//2, h, ODD.documentDisplayName(doc), h
-            )
-            ttText += "<p style='white-space:pre; margin:0px'><small>{}</small></p>\n".format(fPath)
-            ttText += "<p style='margin:0px'><small>{} x {}</small></p>\n".format(doc.width(), doc.height())
-            ttText += "</td></tr></table>"
         
-        self.listToolTip.setText(ttText)
+        self.listToolTip.setContentForDocument(
+                docData,
+                self.vs.settingValue("tooltipSizeMode", True),
+                self.vs.settingValue("tooltipThumbLimit"),
+                self.vs.settingValue("tooltipThumbSize"),
+        )
         
         ttPos = None
         
@@ -312,20 +287,21 @@ class ODDDocker(krita.DockWidget):
             count = len(itemRects)
             if count == 0:
                 return True
-            compareSize = self.calculateRenderSizeForThumbnail()
-            if self.list.flow() == QListView.TopToBottom:
-                for i in range(0, count):
-                    if self.list.item(i).data(Qt.DecorationRole).size().width() != compareSize.width():
-                        itemsWithBadThumbs.append(i)
-            else:
-                for i in range(0, count):
-                    if self.list.item(i).data(Qt.DecorationRole).size().height() != compareSize.width():
-                        itemsWithBadThumbs.append(i)
+            for i in range(0, count):
+                if not self.thumbnailSizeIsCloseEnough(self.list.item(i)):
+                    itemsWithBadThumbs.append(i)
             if itemsWithBadThumbs:
                 return False
             return True
         
         self.resizeDelay.stop()
+        
+        if self.isBeingResized():
+            # docker is still being resized. relayout so the current
+            # thumbnails are drawn scaled, and look again shortly.
+            self.list.scheduleUpdate(ODDListWidget.DirtyLayout)
+            self.restartResizeDelayTimer()
+            return
         logger.debug("delayedResize: lastSize: %s", self.lastSize)
         logger.debug("               new size: %s", self.baseWidget.size())
         doRefresh = False
@@ -337,7 +313,7 @@ class ODDDocker(krita.DockWidget):
             if (lastFlow == QListView.TopToBottom and self.lastSize.width() == self.baseWidget.size().width()) or \
                     (lastFlow == QListView.LeftToRight and self.lastSize.height() == self.baseWidget.size().height()):
                 logger.debug("delayedResize: list is longer/shorter, but not narrower/wider - refresh only deferred.")
-                self.list.updateScrollBarRange()
+                self.list.scheduleUpdate(ODDListWidget.DirtyScrollRange)
                 self.processDeferredDocumentThumbnails()
             else:
                 logger.debug("delayedResize: size changed - refresh.")
@@ -363,7 +339,7 @@ class ODDDocker(krita.DockWidget):
                     self.updateDocumentThumbnail(item.data(self.ItemDocumentRole))
             else:
                 logger.debug(" refresh all items")
-                self.refreshOpenDocuments(soft=True, force=False)
+                self.refreshOpenDocuments(soft=True, force=False, allowSizeSlack=True)
             self.list._doNotRecacheItemRects = False
             self.list.itemRects()
         
@@ -381,14 +357,16 @@ class ODDDocker(krita.DockWidget):
             self.docCreatedDelay.setSingleShot(True)
             self.docCreatedDelay.setInterval(0)
             self.docCreatedDelay.timeout.connect(self._documentCreated)
-        self.createdDoc = doc
-        self.docCreatedDelay.start()
+        # collect every document created this event loop turn and add them together.
+        self.createdDocs.append(doc)
+        if not self.docCreatedDelay.isActive():
+            self.docCreatedDelay.start()
         
     def _documentCreated(self):
-        doc = self.createdDoc
-        self.createdDoc = None
-        logger.debug("_documentCreated - %s", doc)
-        self.addDocumentToList(doc)
+        docs = self.createdDocs
+        self.createdDocs = []
+        logger.debug("_documentCreated - %s docs", len(docs))
+        self.addDocumentsToList(docs)
     
     def documentClosed(self, doc):
         logger.debug("document closed - %s %s", doc, doc.fileName())
@@ -404,10 +382,11 @@ class ODDDocker(krita.DockWidget):
                 self.currentDocument = None
     
     def imageSaved(self, filename):
+        ODD.wakeDocStatePoll()
         # TODO: most (all?) of this should probably be moved to ODD main.
         candidates = []
         for d in ODD.documents:
-            doc = d["document"]
+            doc = d.document
             item = self.findItemWithDocument(doc)
             if item.data(self.ItemModifiedStatusRole) == True and doc.modified() == False:
                 candidates.append(doc)
@@ -418,10 +397,25 @@ class ODDDocker(krita.DockWidget):
             doc = candidates[0]
         logger.info("image saved - %s (doc %s)", filename, str(doc))
         if self.vs.settingValue("refreshOnSave"):
-            self.updateDocumentThumbnail(doc=doc, force=True)
+            if ODDImageChangeDetector.thumbnailsAreCurrent(ODD.docDataFromDocument(doc)):
+                logger.debug("image saved - thumbnails are already up to date, skip refresh.")
+            else:
+                self.updateDocumentThumbnail(doc=doc, force=True)
         
         ODDImageChangeDetector.startCooldown()
     
+    def isBeingResized(self):
+        """
+        a resize is taken to be still going while the mouse is held, not on a
+        canvas (which would just be painting), and resize events are still
+        arriving.
+        """
+        if not QApplication.mouseButtons() & Qt.LeftButton:
+            return False
+        if ODDIdleGovernor.suspendReasons & ODDIdleGovernor.SuspendReasonInput:
+            return False
+        return monotonic_ns() - self.lastResizeTime < self.liveResizeTimeout * 1000000
+    
     def moveEvent(self, event):
         #logger.debug("moveEvent: %s %s %s", event.pos(), self.pos(), self.baseWidget.mapToGlobal(self.baseWidget.pos()))
         self.vs.updatePanelPosition()
@@ -432,50 +426,48 @@ class ODDDocker(krita.DockWidget):
         self.listToolTip.hide()
     
     def refreshAllDelayTimeout(self):
-        self.refreshOpenDocuments(soft=True)
+        exact = self.refreshAllExact
+        self.refreshAllExact = False
+        self.refreshOpenDocuments(soft=True, allowSizeSlack=not exact)
     
-    def itemUpdateTimerTimeout(self):
-        if not self.dockVisible:
-            return
-        
+    def beginLiveInteraction(self):
+        """
+        a display size slider is being dragged. the list is relaid out as it
+        moves, but thumbnails are only regenerated when it is released.
+        """
+        self.liveInteraction = True
+        self.refreshAllDelay.stop()
+    
+    def endLiveInteraction(self, setting):
+        """
+        the slider for setting was released. do what the change needs, as
+        for any other change of it.
+        """
+        self.liveInteraction = False
+        self.vs.applySettingImpact(setting)
+    
+    def documentStatesChanged(self, changes):
+        """
+        changes is a dict of doc id -> ODD.DocState* flags, from ODD.pollDocumentStates.
+        """
         isSettingDisplayThumbnails = self.vs.readSetting("display") == "thumbnails"
         
-        if hasattr(ODD.instance, "fileReverter"):
-            logger.debug("reverting, skip")
-            return
-        
-        itemCount = self.list.count()
-        for i in range(itemCount):
-            item = self.list.item(i)
-            doc = item.data(self.ItemDocumentRole)
-            if not doc:
-                logger.warning("ODDDocker:itemUpdateTimerTimeout: can't find document for item.")
-                continue
-            if doc.width() == 0 or doc.height() == 0:
-                logger.info("ODDDocker:itemUpdateTimerTimeout: closed document still in list at item %s/%s, skip.", i+1, itemCount)
+        for docId,what in changes.items():
+            item = self.itemsByDocId.get(docId)
+            if not item:
                 continue
-            if isSettingDisplayThumbnails:
-                oldModified = item.data(self.ItemModifiedStatusRole)
-                modified = doc.modified()
-                if oldModified != modified:
-                    item.setData(self.ItemModifiedStatusRole, doc.modified())
-                    if self.vs.readSetting("thumbShowModified") != "none":
-                        self.list.update()
-                oldDocSize = item.data(self.ItemDocumentSizeRole)
-                docSize = QSize(doc.width(), doc.height())
-                if oldDocSize != docSize:
-                    item.setData(self.ItemDocumentSizeRole, docSize)
-                    self.list.invalidateItemRectsCache()
-                    self.updateDocumentThumbnail(doc)
-                    self.list.update()
-            else:
-                oldName = item.text()
-                name = ODD.documentDisplayName(doc)
-                if oldName != name:
-                    item.setText(name)
-        
-        if self.dockerStack.currentIndex() == 1:
-            self.updateLabel()
+            docData = ODD.docDataFromId(docId)
+            if what & ODD.DocStateModified:
+                item.setData(self.ItemModifiedStatusRole, docData.stateModified)
+                if isSettingDisplayThumbnails and self.vs.readSetting("thumbShowModified") != "none":
+                    self.list.scheduleUpdate(ODDListWidget.DirtyPaint)
+            if what & ODD.DocStateSize:
+                item.setData(self.ItemDocumentSizeRole, QSize(*docData.stateSize))
+                if isSettingDisplayThumbnails:
+                    self.list.scheduleUpdate(ODDListWidget.DirtyLayout)
+                    self.updateDocumentThumbnail(docData.document)
+            if what & ODD.DocStateName and not isSettingDisplayThumbnails:
+                item.setText(docData.displayName)
 
     def longestDockerSide(self):
         dockrect = self.layout.geometry()
@@ -524,8 +516,7 @@ class ODDDocker(krita.DockWidget):
             ):
             return
         
-        self.list.update()
-        self.list.invalidateItemRectsCache()
+        self.list.scheduleUpdate(ODDListWidget.DirtyLayout)
         self.vs.updatePanelPosition()
     
     def updateScrollBarPolicy(self):
@@ -564,7 +555,8 @@ class ODDDocker(krita.DockWidget):
             win = ODD.windowFromQWindow(qwin)
             activeView = win.activeView()
             if activeView.document() == doc:
-                docData["lastViewInWindow"][qwin] = activeView
+                docData.lastViewInWindow[qwin] = activeView
+                ODD.viewActivated(qwin, activeView)
                 logger.debug("last view on {} in {} set to {}".format(doc, qwin.objectName(), activeView))
             else:
                 logger.warning("ODDDocker.activeViewChanged: mismatch of active doc and view doc, don't set lastViewInWindow.")
@@ -575,6 +567,7 @@ class ODDDocker(krita.DockWidget):
         pass
     
     def resizeEvent(self, event):
+        self.lastResizeTime = monotonic_ns()
         self.restartResizeDelayTimer()
     
     def restartResizeDelayTimer(self):
@@ -592,7 +585,10 @@ class ODDDocker(krita.DockWidget):
     def dockVisibilityChanged(self, visible):
         logger.debug("visibilityChanged: visible = %s", visible)
         self.dockVisible = visible
+        if visible:
+            ODD.wakeDocStatePoll()
         self.processDeferredDocumentThumbnails()
+        self.infoViewChanged()
     
     def markDocumentThumbnailAsDeferred(self, doc=None, item=None):
         """
@@ -638,6 +634,9 @@ class ODDDocker(krita.DockWidget):
         if not self.dockVisible:
             return
         
+        if ODD.startupPhase:
+            return
+        
         if self.deferredItemThumbnailCount == 0:
             return
         
@@ -653,7 +652,7 @@ class ODDDocker(krita.DockWidget):
             logger.info("DEFERRED ITEM COUNT = %s", self.deferredItemThumbnailCount)
         
         viewRect = QRect(QPoint(0, 0), self.list.viewport().size())
-        for i in range(itemCount):
+        for i in self.list.visibleRows():
             item = self.list.item(i)
             if item.data(self.ItemUpdateDeferredRole):
                 visRect = self.list.visualItemRect(item)
@@ -666,25 +665,63 @@ class ODDDocker(krita.DockWidget):
     def dropEvent(self, event):
         logger.debug("dropEvent: %s", event)
     
-    def refreshOpenDocuments(self, soft=False, force=False):
+    def refreshOpenDocuments(self, soft=False, force=False, allowSizeSlack=False):
         if soft:
             count = self.list.count()
             for i in range(count):
                 item = self.list.item(i)
+                if allowSizeSlack and not force and self.thumbnailSizeIsCloseEnough(item):
+                    continue
                 self.updateDocumentThumbnail(item.data(self.ItemDocumentRole), force)
         else:
-            self.deferredItemThumbnailCount = 0
-            logger.debug("DEFERRED ITEM COUNT = 0")
-            count = self.list.count()
-            for i in range(count):
-                item = self.list.item(i)
+            self.reconcileOpenDocuments()
+        self.list.scheduleUpdate(ODDListWidget.DirtyLayout)
+    
+    def reconcileOpenDocuments(self):
+        """
+        bring the list in line with ODD.documents, only adding and removing
+        the items that differ. items of documents that are still open keep
+        their thumbnails, unless the display mode changed.
+        """
+        isSettingDisplayThumbnails = self.vs.readSetting("display") == "thumbnails"
+        
+        removedIds = [docId for docId in self.itemsByDocId if not ODD.docDataFromId(docId)]
+        for docId in removedIds:
+            item = self.itemsByDocId.pop(docId)
+            doc = item.data(self.ItemDocumentRole)
+            self.listToolTip.forgetDocument(docId)
+            self.list.takeItem(self.list.row(item))
+            self.unmarkDocumentThumbnailAsDeferred(doc, item)
+            thumbKey = item.data(self.ItemThumbnailKeyRole)
+            if thumbKey:
+                ODD.removeThumbnailUser(self, doc, thumbKey)
+        
+        for docId,item in self.itemsByDocId.items():
+            docData = ODD.docDataFromId(docId)
+            doc = docData.document
+            item.setData(self.ItemDocumentSizeRole, QSize(doc.width(), doc.height()))
+            item.setData(self.ItemModifiedStatusRole, doc.modified())
+            if isSettingDisplayThumbnails:
+                if item.text():
+                    item.setText("")
+                if not item.data(Qt.DecorationRole):
+                    self.markDocumentThumbnailAsDeferred(doc, item)
+            else:
                 thumbKey = item.data(self.ItemThumbnailKeyRole)
                 if thumbKey:
-                    ODD.removeThumbnailUser(self, item.data(self.ItemDocumentRole), thumbKey)
-            self.list.clear()
-            for docData in ODD.documents:
-                self.addDocumentToList(docData["document"])
-        self.list.invalidateItemRectsCache()
+                    ODD.removeThumbnailUser(self, docData, thumbKey)
+                    item.setData(self.ItemThumbnailKeyRole, None)
+                    item.setData(Qt.DecorationRole, None)
+                self.unmarkDocumentThumbnailAsDeferred(doc, item)
+                item.setText(ODD.documentDisplayName(doc))
+        
+        addedDocs = [docData.document for docData in ODD.documents if not docData.id in self.itemsByDocId]
+        logger.debug("reconcileOpenDocuments: %s removed, %s kept, %s added.", len(removedIds), len(self.itemsByDocId), len(addedDocs))
+        if addedDocs:
+            self.addDocumentsToList(addedDocs)
+        else:
+            self.toggleDockerFiltering()
+            self.ensureListSelectionIsActiveDocument()
     
     def ensureListSelectionIsActiveDocument(self):
         doc = ODD.activeDocument
@@ -696,16 +733,15 @@ class ODDDocker(krita.DockWidget):
         if itemCount == 0:
             return False
         
-        if len(self.list.selectedItems()) > 0:
-            if self.list.selectedItems()[0].data(self.ItemDocumentRole) == doc:
-                return True
+        item = self.findItemWithDocument(doc)
+        if not item:
+            return False
         
-        for i in range(itemCount):
-            item = self.list.item(i)
-            if item.data(self.ItemDocumentRole) == doc:
-                self.list.setCurrentItem(item)
-                return True
-        return False
+        if item.isSelected():
+            return True
+        
+        self.list.setCurrentItem(item)
+        return True
     
     def isItemOnScreen(self, item):
         if not self.dockVisible:
@@ -726,7 +762,7 @@ class ODDDocker(krita.DockWidget):
         toIndex = 1-self.dockerStack.currentIndex()
         self.dockerStack.setCurrentIndex(toIndex)
         if toIndex == 1:
-            self.updateLabel()
+            self.updateInfoView()
     
     def toggleDockerFiltering(self):
         enabled = self.filtButton.isChecked()
@@ -741,7 +777,7 @@ class ODDDocker(krita.DockWidget):
             for i in range(count):
                 item = self.list.item(i)
                 item.setHidden(False)
-        self.list.invalidateItemRectsCache()
+        self.list.scheduleUpdate(ODDListWidget.DirtyLayout)
         self.processDeferredDocumentThumbnails()
     
     def updateDocumentThumbnail(self, doc=None, force=False, ignoreThumbsMoreRecentThan=None):
@@ -760,7 +796,7 @@ class ODDDocker(krita.DockWidget):
             docData = ODD.docDataFromDocument(doc)
             thKey = item.data(self.ItemThumbnailKeyRole)
             if thKey:
-                thTime = docData["thumbnails"][thKey]["lastUsed"]
+                thTime = docData.thumbnails[thKey].lastUsed
                 logger.debug("update thumb: doc:{}, thKey:{}, thTime:{:n}, requiredTime:{:n}".format(ODD.documentDisplayName(doc), thKey, thTime, ignoreThumbsMoreRecentThan))
                 if thTime >= ignoreThumbsMoreRecentThan:
                     logger.debug("update thumb: thumb already more recent than required, cancel.")
@@ -773,9 +809,9 @@ class ODDDocker(krita.DockWidget):
         if force:
             ODD.invalidateThumbnails(doc)
         
-        if not (settingDisplayThumbs and self.isItemOnScreen(item)):
+        if not (settingDisplayThumbs and self.isItemOnScreen(item)) or ODD.startupPhase:
             self.markDocumentThumbnailAsDeferred(None, item)
-            logger.debug("update thumb: item not currently visible or docker in text mode, update later.")
+            logger.debug("update thumb: item not currently visible, docker in text mode or krita starting up, update later.")
             return
         
         self.unmarkDocumentThumbnailAsDeferred(doc, item)
@@ -796,38 +832,81 @@ class ODDDocker(krita.DockWidget):
                 if oldThumbKey:
                     ODD.removeThumbnailUser(self, doc, oldThumbKey)
     
+    def thumbnailSizeIsCloseEnough(self, item):
+        """
+        true if the item's thumbnail is near enough the size it would be
+        generated at now that it can go on being drawn scaled.
+        """
+        thumbKey = item.data(self.ItemThumbnailKeyRole)
+        if not thumbKey or not item.data(Qt.DecorationRole):
+            return False
+        docSize = item.data(self.ItemDocumentSizeRole)
+        if thumbKey[2] != docSize.width() or thumbKey[3] != docSize.height():
+            return False
+        size = self.calculateRenderSizeForThumbnail(docSize)
+        slack = self.thumbRescaleHysteresis
+        return abs(thumbKey[0] - size.width()) <= size.width() * slack and \
+                abs(thumbKey[1] - size.height()) <= size.height() * slack
+    
+    def busyRetryTimerTimeout(self):
+        ODDIdleGovernor.forgetTimer(self.busyRetryTimer)
+        docIds = self.busyDocIds
+        self.busyDocIds = set()
+        for docId in docIds:
+            if item := self.itemsByDocId.get(docId):
+                # re-queues itself if the document is still busy.
+                self.updateDocumentThumbnail(item.data(self.ItemDocumentRole))
+    
     def findItemWithDocument(self, doc):
-        itemCount = self.list.count()
-        for i in range(itemCount):
-            searchItem = self.list.item(i)
-            if searchItem.data(self.ItemDocumentRole) == doc:
-                return searchItem
-        return None
+        docData = ODD.docDataFromDocument(doc)
+        return self.itemsByDocId.get(docData.id) if docData else None
+    
+    def findItemWithDocId(self, docId):
+        return self.itemsByDocId.get(docId)
     
     def addDocumentToList(self, doc):
-        logger.debug("addDocumentToList: %s", doc)
-        item = QListWidgetItem("", self.list)
-        item.setData(self.ItemDocumentRole, doc)
-        item.setData(self.ItemDocumentSizeRole, QSize(doc.width(), doc.height()))
-        item.setData(self.ItemModifiedStatusRole, doc.modified())
-        if self.vs.settingValue("display") == self.vs.UI["display"]["btnThumbnails"]:
-            self.updateItemThumbnail(item, doc)
-        else:
-            item.setText(ODD.documentDisplayName(doc))
+        self.addDocumentsToList([doc])
+    
+    def addDocumentsToList(self, docs):
+        """
+        add items for several documents with a single filter and layout pass.
+        thumbnails are deferred, then generated for the items that are visible.
+        """
+        isSettingDisplayThumbnails = self.vs.settingValue("display") == self.vs.UI["display"]["btnThumbnails"]
+        addedCount = 0
+        for doc in docs:
+            logger.debug("addDocumentToList: %s", doc)
+            docData = ODD.docDataFromDocument(doc)
+            if not docData:
+                logger.warning("addDocumentToList: document is not registered.")
+                continue
+            if docData.id in self.itemsByDocId:
+                continue
+            item = QListWidgetItem("", self.list)
+            item.setData(self.ItemDocumentRole, doc)
+            item.setData(self.ItemDocumentIdRole, docData.id)
+            self.itemsByDocId[docData.id] = item
+            item.setData(self.ItemDocumentSizeRole, QSize(doc.width(), doc.height()))
+            item.setData(self.ItemModifiedStatusRole, doc.modified())
+            if isSettingDisplayThumbnails:
+                self.markDocumentThumbnailAsDeferred(doc, item)
+            else:
+                item.setText(ODD.documentDisplayName(doc))
+            addedCount += 1
+        
+        if addedCount == 0:
+            return
         
+        # filtering also relayouts the list and processes deferred thumbnails.
         self.toggleDockerFiltering()
-        self.list.invalidateItemRectsCache()
-        self.list.update()
         self.ensureListSelectionIsActiveDocument()
     
     def removeDocumentFromList(self, doc):
         item = None
-        itemCount = self.list.count()
-        for i in range(itemCount):
-            searchItem = self.list.item(i)
-            if searchItem.data(self.ItemDocumentRole) == doc:
-                item = self.list.takeItem(self.list.row(searchItem))
-                break
+        docData = ODD.docDataFromDocument(doc)
+        if docData and (searchItem := self.itemsByDocId.pop(docData.id, None)):
+            self.listToolTip.forgetDocument(docData.id)
+            item = self.list.takeItem(self.list.row(searchItem))
         if item:
             logger.debug("deleting item")
             self.unmarkDocumentThumbnailAsDeferred(item.data(self.ItemDocumentRole), item)
@@ -835,7 +914,7 @@ class ODDDocker(krita.DockWidget):
                 ODD.removeThumbnailUser(self, doc, item.data(self.ItemThumbnailKeyRole))
             del item
             self.ensureListSelectionIsActiveDocument()
-            self.list.invalidateItemRectsCache()
+            self.list.scheduleUpdate(ODDListWidget.DirtyLayout)
         else:
             logger.warning("did not find item to delete!")
     
@@ -906,8 +985,12 @@ class ODDDocker(krita.DockWidget):
         return size
     
     def generateThumbnailForItem(self, item, doc):
-        # ensure the thumbnail will be complete.
-        doc.waitForDone()
+        # a busy document keeps its current thumbnail until it is idle again.
+        if ODD.documentIsBusy(doc):
+            logger.debug("generateThumbnailForItem: %s is busy, try again later.", doc.fileName())
+            self.busyDocIds.add(item.data(self.ItemDocumentIdRole))
+            ODDIdleGovernor.startTimer(self.busyRetryTimer)
+            return None
         
         size = self.calculateDisplaySizeForThumbnail(item.data(self.ItemDocumentSizeRole))
         
@@ -944,107 +1027,31 @@ class ODDDocker(krita.DockWidget):
         
         return (thumbnail, thumbKey)
 
-    def updateLabel(self):
-        app = Application
-        newLine = "<br/>"
-        newText = ""
-        
-        if not self:
-            return
-        
+    def infoViewChanged(self):
+        if self.dockVisible and self.dockerStack.currentIndex() == 1 and not self.infoUpdateDelay.isActive():
+            self.infoUpdateDelay.start()
+    
+    def infoUpdateDelayTimeout(self):
+        if self.dockVisible and self.dockerStack.currentIndex() == 1:
+            self.updateInfoView()
+    
+    def updateInfoView(self):
         qwin = self.parent()
+        self.infoModel.update(qwin)
         
-        wins = ODD.windows
-        thisWin = ODD.windowFromQWindow(self.parent()) if self.parent() else None
-        for w in wins:
-            newText += "WINDOW {} ({}) {}{}\n".format(
+        newText = "all thumbs: {:1.3f}mb, of which unused: {:1.3f}mb".format(
+                self.infoModel.totalThumbBits/8/1048576, ODD.unusedCacheSize/8/1048576
+        )
+        thisWin = ODD.windowFromQWindow(qwin) if qwin else None
+        for w in ODD.windows:
+            newText += "<br/>WINDOW {} ({}) {}".format(
                     str(w),
                     w.qwindow().objectName(),
                     "&lt;--" if w == thisWin else "",
-                    newLine if w != wins[-1] else ""
-            )
-        
-        views = ODD.views
-        docs = ODD.documents
-        bitCountAll = 0
-        for doc in docs:
-            d = doc["document"]
-            newText += \
-                    "<div>\n" \
-                    " <ul type=none style='margin-left:-32px; -qt-list-indent:1'>\n" \
-                    "  <li style='font-weight:bold;'>DOC: {}</li>\n".format(Path(d.fileName()).name or "[not saved]")
-            newText += "  <ul type=none style='margin-left:8px; -qt-list-indent:1'>\n"
-            newText += "   <li><b>Opened</b>: {}</li>\n".format(doc["created"])
-            viewsThisWindowCount = doc["viewCountPerWindow"][qwin] if qwin in doc["viewCountPerWindow"] else 0
-            viewsOtherWindowsCount = sum(0 if k == qwin else v for k,v in doc["viewCountPerWindow"].items())
-            newText += "   <li><b>Views: {}</b> ({} in this window, {} in others)</li>\n".format(
-                    viewsThisWindowCount + viewsOtherWindowsCount,
-                    viewsThisWindowCount,
-                    viewsOtherWindowsCount
             )
-            thumbCount = len(doc["thumbnails"])
-            if thumbCount > 0:
-                bitCount = 0
-                usedThumbText = ""
-                unusedThumbTexts = []
-                for thumbKey,thumbData in doc["thumbnails"].items():
-                    pm = thumbData["pixmap"]
-                    userCount = len(thumbData["users"])
-                    thumbBitCount = thumbData["size"]
-                    bitCount += thumbBitCount
-                    valid = thumbData["valid"]
-                    lastUsedMs = thumbData["lastUsed"]//1000000
-                    gen = thumbData["generator"]
-                    if userCount == 0:
-                        unusedThumbTexts.append((
-                                lastUsedMs,
-                                thumbBitCount,
-                                "    <li>{}: 0 users, {:1.2f}kb, last use: {}ms {}</li>\n".format(
-                                        thumbKey,
-                                        thumbBitCount/8/1024,
-                                        lastUsedMs,
-                                        "({:1.2f}%)".format(gen.progress()*100) if gen else ""
-                                ),
-                        ))
-                    else:
-                        usedThumbText += "    <li><b>{}</b>: {} user{}, {:1.2f}kb{} {}</li>\n".format(
-                                thumbKey,
-                                userCount,
-                                "" if userCount==1 else "s",
-                                thumbBitCount/8/1024,
-                                "" if valid else "<i>, outdated</i>",
-                                "({:1.2f}%)".format(gen.progress()*100) if gen else ""
-                        )
-                
-                unusedThumbText = ""
-                unusedThumbCount = 0
-                unusedThumbOverflowBitCount = 0
-                unusedThumbTexts.sort(key=lambda textItem : textItem[0], reverse=True)
-                for textItem in unusedThumbTexts:
-                    if unusedThumbCount < 3:
-                        unusedThumbText += textItem[2]
-                    else:
-                        unusedThumbOverflowBitCount += textItem[1]
-                    unusedThumbCount += 1
-                
-                newText += "   <li><b>Thumbs: {}</b> ({:1.2f}kb)</li>\n".format(thumbCount, bitCount/8/1024)
-                newText += "   <ul type=none style='margin-left:8px; -qt-list-indent:1; font-size:small;'>\n"
-                newText += usedThumbText + unusedThumbText
-                if unusedThumbCount >= 4:
-                    newText += "    <li><i>...and {} less recently used, total {:1.2f}kb</i></li>\n".format(
-                            unusedThumbCount - 3, unusedThumbOverflowBitCount/8/1024
-                    )
-                newText += "   </ul>\n"
-                bitCountAll += bitCount
-            newText += "  </ul>\n </ul>\n</div>\n"
-        
-        self.infoLabel.setText(
-                "<html>" + \
-                "all thumbs: " + "{:1.3f}".format(bitCountAll/8/1048576) + \
-                "mb, of which unused: " + "{:1.3f}".format(ODD.unusedCacheSize/8/1048576) + \
-                "mb<br/>" + newText + \
-                "</html>"
-        )
+        if newText != self.infoLabel.text():
+            self.infoLabel.setText(newText)
 
 
 from .oddimagechangedetector import ODDImageChangeDetector
+from .oddidlegovernor import ODDIdleGovernor
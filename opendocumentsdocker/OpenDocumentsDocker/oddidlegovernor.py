@@ -0,0 +1,191 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from krita import *
+from .odd import ODD
+
+import logging
+logger = logging.getLogger("odd")
+
+
+class ODDIdleGovernor(QObject):
+    """
+    suspends the plugin's timers and background jobs while krita is unfocused
+    or all of its windows are minimised or hidden, and while the user is
+    drawing on a canvas. does one catch-up pass when they are over.
+    """
+    SuspendReasonAway = 1
+    SuspendReasonInput = 2
+    instance = None
+    suspendReasons = SuspendReasonAway # krita starts unfocused.
+    periodicTimers = []
+    jobTimers = []
+    suspendedTimers = []
+    inputQuietTimer = None
+    canvasClassNames = ("KisOpenGLCanvas2", "KisQPainterCanvas")
+    
+    def __init__(self):
+        logger.debug("ODDIdleGovernor:__init__")
+        super(ODDIdleGovernor, self).__init__()
+        cls = self.__class__
+        cls.instance = self
+        
+        cls.inputQuietTimer = QTimer(self)
+        cls.inputQuietTimer.setInterval(400)
+        cls.inputQuietTimer.setSingleShot(True)
+        cls.inputQuietTimer.timeout.connect(cls.inputQuietTimerTimeout)
+    
+    @classmethod
+    def isSuspended(cls):
+        return cls.suspendReasons != 0
+    
+    @classmethod
+    def addPeriodicTimer(cls, timer):
+        """
+        timer keeps running on its own, but is stopped while suspended.
+        """
+        cls.periodicTimers.append(timer)
+        if cls.isSuspended() and timer.isActive():
+            timer.stop()
+            cls.suspendedTimers.append(timer)
+    
+    @classmethod
+    def wakeTimer(cls, timer):
+        """
+        start a periodic timer that stops itself when it has nothing to do.
+        while suspended, it is started on resume instead.
+        """
+        if cls.isSuspended():
+            if not timer in cls.suspendedTimers:
+                cls.suspendedTimers.append(timer)
+        elif not timer.isActive():
+            timer.start()
+    
+    @classmethod
+    def startTimer(cls, timer):
+        """
+        use instead of timer.start() for the step timers of background jobs,
+        so they don't start while suspended. call forgetTimer when the job ends.
+        """
+        if not timer in cls.jobTimers:
+            cls.jobTimers.append(timer)
+        if cls.isSuspended():
+            if not timer in cls.suspendedTimers:
+                cls.suspendedTimers.append(timer)
+        else:
+            timer.start()
+    
+    @classmethod
+    def forgetTimer(cls, timer):
+        if timer in cls.jobTimers:
+            cls.jobTimers.remove(timer)
+        if timer in cls.suspendedTimers:
+            cls.suspendedTimers.remove(timer)
+    
+    @classmethod
+    def kritaIsAway(cls):
+        if not ODD.kritaHasFocus:
+            return True
+        return all(qwin.isMinimized() or not qwin.isVisible() for qwin in ODD.winForQWin)
+    
+    @classmethod
+    def updateState(cls):
+        if cls.kritaIsAway():
+            cls.addSuspendReason(cls.SuspendReasonAway)
+        else:
+            cls.removeSuspendReason(cls.SuspendReasonAway)
+    
+    @classmethod
+    def addSuspendReason(cls, reason):
+        if cls.suspendReasons & reason:
+            return
+        wasSuspended = cls.isSuspended()
+        cls.suspendReasons |= reason
+        
+        if reason == cls.SuspendReasonAway:
+            ODDImageChangeDetector.addStopper(ODDImageChangeDetector.StopReasonBlur)
+        elif reason == cls.SuspendReasonInput:
+            ODDImageChangeDetector.inputStarted()
+            ODDImageChangeDetector.addStopper(ODDImageChangeDetector.StopReasonInput)
+        
+        if wasSuspended:
+            return
+        logger.debug("ODDIdleGovernor: suspend. (reason=%s)", reason)
+        for timer in cls.periodicTimers + cls.jobTimers:
+            if timer.isActive():
+                timer.stop()
+                cls.suspendedTimers.append(timer)
+    
+    @classmethod
+    def removeSuspendReason(cls, reason):
+        if not cls.suspendReasons & reason:
+            return
+        cls.suspendReasons &= ~reason
+        
+        if reason == cls.SuspendReasonAway:
+            ODDImageChangeDetector.removeStopper(ODDImageChangeDetector.StopReasonBlur)
+            ODDImageChangeDetector.startCooldown()
+        elif reason == cls.SuspendReasonInput:
+            ODDImageChangeDetector.removeStopper(ODDImageChangeDetector.StopReasonInput)
+            ODDImageChangeDetector.inputFinished()
+        
+        if cls.isSuspended():
+            return
+        logger.debug("ODDIdleGovernor: resume, %s timers were suspended.", len(cls.suspendedTimers))
+        timers = cls.suspendedTimers
+        cls.suspendedTimers = []
+        for timer in timers:
+            try:
+                timer.start()
+            except RuntimeError:
+                # job was deleted while suspended.
+                pass
+        
+        # catch up on whatever changed meanwhile.
+        ODD.wakeDocStatePoll()
+        ODD.pollDocumentStates()
+        for docker in ODD.dockers:
+            docker.processDeferredDocumentThumbnails()
+    
+    @classmethod
+    def watchCanvases(cls, qwin):
+        """
+        filter input events of the canvas widgets of views in qwin that
+        aren't watched yet. only the view subwindows are searched, and each
+        of them only once.
+        """
+        if not cls.instance:
+            return
+        mdiArea = qwin.findChild(QMdiArea)
+        if not mdiArea:
+            return
+        for subWindow in mdiArea.subWindowList():
+            if subWindow.property("oddCanvasWatched"):
+                continue
+            found = False
+            for widget in subWindow.findChildren(QWidget):
+                if widget.metaObject().className() in cls.canvasClassNames:
+                    widget.installEventFilter(cls.instance)
+                    found = True
+            if found:
+                subWindow.setProperty("oddCanvasWatched", True)
+    
+    def eventFilter(self, obj, event):
+        cls = self.__class__
+        t = event.type()
+        if t in (QEvent.TabletPress, QEvent.MouseButtonPress, QEvent.TouchBegin):
+            cls.inputQuietTimer.stop()
+            cls.addSuspendReason(cls.SuspendReasonInput)
+        elif t in (QEvent.TabletRelease, QEvent.MouseButtonRelease, QEvent.TouchEnd,
+                   QEvent.FocusOut, QEvent.WindowDeactivate, QEvent.Hide):
+            # the release is never seen if a popup grabs the mouse or focus
+            # is lost mid-stroke, so losing the canvas counts as one too.
+            if cls.suspendReasons & cls.SuspendReasonInput:
+                cls.inputQuietTimer.start()
+        return False
+    
+    @classmethod
+    def inputQuietTimerTimeout(cls):
+        cls.removeSuspendReason(cls.SuspendReasonInput)
+
+
+from .oddimagechangedetector import ODDImageChangeDetector
@@ -1,6 +1,7 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from PyQt5.QtCore import QTimer, QSize
+from PyQt5.QtGui import QImage
 from krita import *
 from .odd import ODD
 from time import *
@@ -9,21 +10,61 @@ import logging
 logger = logging.getLogger("odd")
 
 
+class ODDChangeRecord:
+    """
+    detector state for one document that has changed, or is the active one.
+    """
+    __slots__ = ("docData", "size", "busyLastCheck", "hasChanged", "changeTime", "refreshDelay", "evidence", "deferred")
+    
+    def __init__(self, docData):
+        doc = docData.document
+        self.docData = docData
+        self.size = QSize(doc.width(), doc.height())
+        self.busyLastCheck = False
+        self.hasChanged = False
+        self.changeTime = 0
+        self.refreshDelay = 0
+        self.evidence = 0
+        self.deferred = False
+
+
 class ODDImageChangeDetector(QObject):
     StopReasonUser = 1
     StopReasonBlur = 2
     StopReasonCooldown = 4
     StopReasonNoDoc = 8
     StopReasonNoChanges = 16
+    StopReasonUndoStack = 32
+    StopReasonInput = 64
+    EvidenceLock = 1
+    EvidenceModified = 2
+    EvidenceUndo = 4
+    ChangeNone = 0
+    ChangeSubtle = 1
+    ChangeVisible = 2
     checkTimer = None
     refreshCheckTimer = None
     refreshDelay = 0
     cooldownTimer = None
     stopReasons = StopReasonBlur
     instance = None
-    changedDocs = []
+    changedDocs = {}
     changedDoc = None
     pendingCount = 0
+    knownUndoStacks = None
+    inputWasModified = False
+    inputUndoMoved = False
+    pollIndex = -1
+    backgroundPollsPerTick = 1
+    checkIntervalMin = 0
+    checkIntervalMax = 1000
+    checkIntervalBackoff = 2.0
+    sampleSizeMax = 256
+    sampleThreshold = 6
+    maxSkippedChanges = 4
+    deferredRefreshDelay = 30000
+    sampleQuantizeTables = None
+    saveWindow = 2000
     
     def __init__(self):
         logger.debug("ODDImageChangeDetector:__init__")
@@ -34,7 +75,7 @@ class ODDImageChangeDetector(QObject):
         cls.checkTimer = QTimer(self)
         setting = ODDSettings.readSettingFromConfig("refreshPeriodicallyChecks")
         checkInterval = ODDSettings.SD["refreshPeriodicallyChecks"]["values"][convertSettingStringToValue("refreshPeriodicallyChecks", setting)]
-        cls.checkTimer.setInterval(checkInterval)
+        cls.setCheckIntervalMin(checkInterval)
         cls.checkTimer.timeout.connect(cls.checkTimerTimeout)
         
         setting = ODDSettings.readSettingFromConfig("refreshPeriodicallyDelay")
@@ -49,45 +90,89 @@ class ODDImageChangeDetector(QObject):
         cls.cooldownTimer.setSingleShot(True)
         cls.cooldownTimer.timeout.connect(cls.cooldownTimerTimeout)
         
+        cls.deferredRefreshTimer = QTimer(self)
+        cls.deferredRefreshTimer.setInterval(cls.deferredRefreshDelay)
+        cls.deferredRefreshTimer.setSingleShot(True)
+        cls.deferredRefreshTimer.timeout.connect(cls.deferredRefreshTimerTimeout)
+        
+        # channel values in steps of sampleThreshold, on two grids half a step apart.
+        t = cls.sampleThreshold
+        cls.sampleQuantizeTables = (bytes(v // t for v in range(256)), bytes((v + t // 2) // t for v in range(256)))
+        
+        Application.notifier().imageSaved.connect(cls.imageSaved)
+        
         if not ODDSettings.readSettingFromConfig("refreshPeriodically") == "true":
             cls.stopReasons |= cls.StopReasonUser
     
     @classmethod
     def addStopper(cls, stopReason):
-        if stopReason not in [cls.StopReasonUser, cls.StopReasonBlur, cls.StopReasonCooldown, cls.StopReasonNoDoc, cls.StopReasonNoChanges]:
+        if stopReason not in [cls.StopReasonUser, cls.StopReasonBlur, cls.StopReasonCooldown, cls.StopReasonNoDoc, cls.StopReasonNoChanges, cls.StopReasonUndoStack, cls.StopReasonInput]:
             return
         
         cls.stopReasons |= stopReason
         
+        if stopReason == cls.StopReasonUser:
+            cls.deferredRefreshTimer.stop()
+            ODDIdleGovernor.forgetTimer(cls.deferredRefreshTimer)
+            cls.knownUndoStacks = None
+        
         if cls.refreshCheckTimer.isActive():
-            if stopReason & (cls.StopReasonUser | cls.StopReasonBlur | cls.StopReasonNoChanges):
+            if stopReason & (cls.StopReasonUser | cls.StopReasonBlur | cls.StopReasonNoChanges | cls.StopReasonInput):
                 logger.debug("ODDImageChangeDetector: stopping refreshCheckTimer. (reason=%s)", stopReason)
                 cls.refreshCheckTimer.stop()
         
         if cls.checkTimer.isActive():
-            if stopReason & (cls.StopReasonUser | cls.StopReasonBlur | cls.StopReasonCooldown | cls.StopReasonNoDoc):
+            if stopReason & (cls.StopReasonUser | cls.StopReasonBlur | cls.StopReasonCooldown | cls.StopReasonNoDoc | cls.StopReasonUndoStack | cls.StopReasonInput):
                 logger.debug("ODDImageChangeDetector: stopping checkTimer. (reason=%s)", stopReason)
                 cls.checkTimer.stop()
     
     @classmethod
     def removeStopper(cls, stopReason):
-        if stopReason not in [cls.StopReasonUser, cls.StopReasonBlur, cls.StopReasonCooldown, cls.StopReasonNoDoc, cls.StopReasonNoChanges]:
+        if stopReason not in [cls.StopReasonUser, cls.StopReasonBlur, cls.StopReasonCooldown, cls.StopReasonNoDoc, cls.StopReasonNoChanges, cls.StopReasonUndoStack, cls.StopReasonInput]:
             return
         if not cls.stopReasons:
             return
         
+        wasUserStopped = cls.stopReasons & cls.StopReasonUser
         cls.stopReasons &= ~stopReason
         
+        if wasUserStopped and stopReason == cls.StopReasonUser:
+            cls.rememberUndoStacks()
+        
         if not cls.checkTimer.isActive():
-            if not (cls.stopReasons & (cls.StopReasonUser | cls.StopReasonBlur | cls.StopReasonCooldown | cls.StopReasonNoDoc)):
+            if not (cls.stopReasons & (cls.StopReasonUser | cls.StopReasonBlur | cls.StopReasonCooldown | cls.StopReasonNoDoc | cls.StopReasonUndoStack | cls.StopReasonInput)):
                 logger.debug("ODDImageChangeDetector: restarting checkTimer.")
+                cls.checkTimer.setInterval(cls.checkIntervalMin)
                 cls.checkTimer.start()
         
         if not cls.refreshCheckTimer.isActive():
-            if not (cls.stopReasons & (cls.StopReasonUser | cls.StopReasonBlur | cls.StopReasonNoChanges)):
+            if not (cls.stopReasons & (cls.StopReasonUser | cls.StopReasonBlur | cls.StopReasonNoChanges | cls.StopReasonInput)):
                 logger.debug("ODDImageChangeDetector: restarting refreshCheckTimer.")
                 cls.refreshCheckTimer.start()
     
+    @classmethod
+    def setCheckIntervalMin(cls, interval):
+        cls.checkIntervalMin = interval
+        if cls.checkTimer.interval() < interval or not cls.checkTimer.isActive():
+            cls.checkTimer.setInterval(interval)
+    
+    @classmethod
+    def adaptCheckInterval(cls, sawChange):
+        """
+        check at the fastest rate while changes are happening, and back off
+        exponentially (up to checkIntervalMax) while nothing is happening.
+        """
+        if sawChange:
+            interval = cls.checkIntervalMin
+        else:
+            interval = min(
+                    max(cls.checkIntervalMax, cls.checkIntervalMin),
+                    int(cls.checkTimer.interval() * cls.checkIntervalBackoff)
+            )
+        if interval != cls.checkTimer.interval():
+            #logger.debug("ODDImageChangeDetector: check interval -> %s", interval)
+            cls.checkTimer.setInterval(interval)
+    
     @classmethod
     def startCooldown(cls):
         logger.debug("ODDImageChangeDetector: cooldown starting...")
@@ -99,110 +184,480 @@ class ODDImageChangeDetector(QObject):
         logger.debug("ODDImageChangeDetector: ...cooldown finished.")
         cls.removeStopper(cls.StopReasonCooldown)
     
+    @classmethod
+    def findChangedDoc(cls, docData):
+        return cls.changedDocs.get(docData.id)
+    
+    @classmethod
+    def changedDocForDocData(cls, docData):
+        """
+        find the entry in changedDocs for docData, adding one if there isn't one yet.
+        """
+        if cd := cls.findChangedDoc(docData):
+            return cd
+        cd = cls.changedDocs[docData.id] = ODDChangeRecord(docData)
+        return cd
+    
+    @classmethod
+    def forgetDocument(cls, docData):
+        """
+        drop any state held for a document that was closed.
+        """
+        if cls.changedDocs.pop(docData.id, None):
+            logger.debug("ODDImageChangeDetector: forget %s", docData.document)
+        if cls.changedDoc and cls.changedDoc.docData is docData:
+            logger.debug("and remove as current changedDoc")
+            cls.changedDoc = None
+        cls.unbindUndoStack(docData)
+    
     @classmethod
     def activeDocumentChanged(cls):
         doc = ODD.activeDocument
         
-        if not cls.changedDoc or doc != cls.changedDoc["docData"]["document"]:
+        if not cls.changedDoc or doc != cls.changedDoc.docData.document:
             if cls.changedDoc:
-                if not cls.changedDoc["hasChanged"]:
+                if not cls.changedDoc.hasChanged:
                     # remove inactive and unchanged doc.
-                    del cls.changedDocs[cls.changedDocs.index(cls.changedDoc)]
+                    del cls.changedDocs[cls.changedDoc.docData.id]
+            cls.changedDoc = None
             if doc:
-                cdWasNone = not cls.changedDoc
-                found = False
                 logger.debug("checking if doc in changedDocs")
-                for cd in cls.changedDocs:
-                    if cd["docData"]["document"] == doc:
-                        cls.changedDoc = cd
-                        found = True
-                        break
-                if not found:
-                    cls.changedDocs.append({
-                        "docData":      ODD.docDataFromDocument(doc),
-                        "size":         QSize(doc.width(), doc.height()),
-                        "busyLastCheck":False,
-                        "hasChanged":   False,
-                        "changeTime":   0,
-                        "refreshDelay": 0,
-                    })
-                    cls.changedDoc = cls.changedDocs[-1]
-                if cdWasNone:
-                    cls.removeStopper(cls.StopReasonNoDoc)
-            else:
-                cls.changedDoc = None
-                cls.addStopper(cls.StopReasonNoDoc)
+                docData = ODD.docDataFromDocument(doc)
+                if docData:
+                    cls.changedDoc = cls.changedDocForDocData(docData)
+                # else doc not registered yet (its view is still being created).
+        
+        # background documents are watched too, so only stop if there are none at all.
+        if ODD.documents:
+            cls.removeStopper(cls.StopReasonNoDoc)
+        else:
+            cls.addStopper(cls.StopReasonNoDoc)
+        cls.updatePollingNeeded()
+    
+    @classmethod
+    def updatePollingNeeded(cls):
+        """
+        polling can stop altogether if every open document reports its changes
+        through an undo stack that is confirmed to be its own.
+        """
+        if all(docData.undoStackConfirmed for docData in ODD.documents):
+            cls.addStopper(cls.StopReasonUndoStack)
+        else:
+            cls.removeStopper(cls.StopReasonUndoStack)
+    
+    @classmethod
+    def findUndoStacks(cls):
+        """
+        search the object trees of the main windows for undo stacks.
+        krita doesn't expose them through its python api, so they are
+        recognised by class name and by having an indexChanged(int) signal.
+        a document's own stack is parented to the document, which python
+        can't reach, so this only finds stacks that something in a window
+        holds on to. it may find none, and then every document is polled.
+        """
+        stacks = []
+        for qwin in ODD.winForQWin:
+            for obj in qwin.findChildren(QObject):
+                mo = obj.metaObject()
+                if "UndoStack" in mo.className() and mo.indexOfSignal("indexChanged(int)") != -1:
+                    stacks.append(obj)
+        return stacks
+    
+    @classmethod
+    def rememberUndoStacks(cls):
+        """
+        note the undo stacks that exist now, so they aren't taken for the
+        stack of a document created later. the search is costly, so it isn't
+        done while the detector is off (knownUndoStacks is None then) or
+        krita is starting up.
+        """
+        if cls.stopReasons & cls.StopReasonUser or ODD.startupPhase:
+            cls.knownUndoStacks = None
+            return
+        cls.knownUndoStacks = cls.findUndoStacks()
+    
+    @classmethod
+    def documentCreated(cls, docData):
+        """
+        the first view of docData was just created. if exactly one undo stack
+        appeared since the last search, it is most likely the document's, so
+        listen to it. the document is still polled until the stack is confirmed
+        to be its own (see verifyUndoStack).
+        """
+        if cls.knownUndoStacks is None:
+            # nothing to tell this document's stack apart from older ones by.
+            cls.rememberUndoStacks()
+            return
+        stacks = cls.findUndoStacks()
+        newStacks = [s for s in stacks if not any(s is k for k in cls.knownUndoStacks)]
+        cls.knownUndoStacks = stacks
+        if len(newStacks) != 1:
+            logger.debug("ODDImageChangeDetector: %s new undo stacks with %s, will poll instead.", len(newStacks), docData.document.fileName())
+            return
+        
+        stack = newStacks[0]
+        try:
+            stack.indexChanged.connect(lambda index, s=stack, dd=docData: cls.undoStackIndexChanged(s, dd))
+        except AttributeError:
+            logger.warning("ODDImageChangeDetector: could not connect to undo stack %s, will poll instead.", stack)
+            return
+        stack.destroyed.connect(lambda obj=None, dd=docData: cls.unbindUndoStack(dd))
+        docData.undoStack = stack
+        docData.undoStackConfirmed = False
+        logger.debug("ODDImageChangeDetector: listening to undo stack of %s, unconfirmed.", docData.document.fileName())
+    
+    @classmethod
+    def unbindUndoStack(cls, docData):
+        wasConfirmed = docData.undoStackConfirmed
+        docData.undoStack = None
+        docData.undoStackConfirmed = False
+        if wasConfirmed:
+            cls.updatePollingNeeded()
+    
+    @classmethod
+    def undoStackIndexChanged(cls, stack, docData):
+        if docData.undoStack is not stack or ODD.docDataFromId(docData.id) is not docData:
+            return
+        ODD.wakeDocStatePoll()
+        if cls.changedDoc and cls.changedDoc.docData is docData:
+            cls.inputUndoMoved = True
+        if not docData.undoStackConfirmed:
+            # the document is still polled, so this change is seen anyway.
+            # krita updates modified a moment after the index.
+            wasModified = docData.document.modified()
+            QTimer.singleShot(0, lambda: cls.verifyUndoStack(stack, docData, wasModified))
+            return
+        if cls.stopReasons & (cls.StopReasonUser | cls.StopReasonCooldown):
+            # not refreshing, but the thumbnails are out of date all the same.
+            docData.generation += 1
+            return
+        cls.markChanged(cls.changedDocForDocData(docData), cls.EvidenceUndo)
+    
+    @classmethod
+    def verifyUndoStack(cls, stack, docData, wasModified):
+        """
+        a change to an unmodified document always makes it modified, so if the
+        stack changed and its document stayed unmodified, the stack belongs to
+        some other document. a document that was already modified tells
+        nothing either way, so wait for another change.
+        """
+        if docData.undoStack is not stack or docData.undoStackConfirmed or ODD.docDataFromId(docData.id) is not docData:
+            return
+        if wasModified:
+            return
+        if docData.document.modified():
+            logger.debug("ODDImageChangeDetector: undo stack of %s confirmed, stop polling it.", docData.document.fileName())
+            docData.undoStackConfirmed = True
+            cls.updatePollingNeeded()
+        else:
+            logger.debug("ODDImageChangeDetector: undo stack changed but %s didn't, will poll instead.", docData.document.fileName())
+            cls.unbindUndoStack(docData)
+    
+    @classmethod
+    def inputStarted(cls):
+        cd = cls.changedDoc
+        cls.inputWasModified = cd.docData.document.modified() if cd else False
+        cls.inputUndoMoved = False
+    
+    @classmethod
+    def inputFinished(cls):
+        """
+        polling was stopped while the user pressed on a canvas. that may have
+        been a stroke, or just a pan, zoom, pick or click, so it is only a
+        change if the document's undo stack moved or it became modified
+        meanwhile. a document whose stack isn't known can't tell a stroke
+        from a pan, so it is only compared with the last refresh once left
+        alone (see noteLock).
+        """
+        if cls.stopReasons & cls.StopReasonUser:
+            return
+        cd = cls.changedDoc
+        if not cd or cd.docData.undoStackConfirmed:
+            return
+        if cls.pollDocument(cd.docData):
+            # busy, or became modified. either is dealt with already.
+            return
+        if cls.inputUndoMoved:
+            cls.markChanged(cd, cls.EvidenceUndo)
+        elif cd.docData.document.modified() != cls.inputWasModified:
+            cls.markChanged(cd, cls.EvidenceModified)
+        elif not cd.docData.undoStack:
+            cls.noteLock(cd)
+    
+    @classmethod
+    def thumbnailsAreCurrent(cls, docData):
+        """
+        True if every thumbnail of docData was made since the last edit.
+        
+        the generation is bumped by every edit that can be seen whether or not
+        the detector is running (the document becoming modified, its confirmed
+        undo stack moving), so thumbnails made while the document was
+        unmodified can be trusted by generation alone. once it is modified,
+        further edits only show up if they are being tracked: through a
+        confirmed undo stack, or by the detector polling it, with no change
+        left unrefreshed. (a lock not yet looked at doesn't count, the check
+        that is still to come refreshes if the image turns out to differ.)
+        """
+        if not docData or not docData.thumbnails:
+            return False
+        if (cd := cls.findChangedDoc(docData)) and cd.hasChanged:
+            return False
+        editsTracked = docData.undoStackConfirmed or not cls.stopReasons & cls.StopReasonUser
+        return all(
+            th.valid and not th.generator and th.generation == docData.generation and (th.madeUnmodified or editsTracked)
+            for th in docData.thumbnails.values()
+        )
+    
+    @classmethod
+    def imageSaved(cls, filename):
+        docData = next((dd for dd in ODD.documents if dd.document.fileName() == filename), None)
+        if not docData and ODD.activeDocument:
+            docData = ODD.docDataFromDocument(ODD.activeDocument)
+        if not docData:
+            return
+        docData.wasModified = False
+        docData.saveTime = monotonic_ns()
+    
+    @classmethod
+    def markChanged(cls, cd, evidence):
+        cd.evidence |= evidence
+        # only real edits come here, so thumbnails from before now are out
+        # of date.
+        cd.docData.generation += 1
+        if not cd.hasChanged:
+            # a change has begun.
+            logger.debug("ODDImageChangeDetector: detected change in %s", cd.docData.document.fileName())
+            cd.hasChanged = True
+        cls.scheduleCheck(cd)
+        ODD.wakeDocStatePoll()
+    
+    @classmethod
+    def noteLock(cls, cd):
+        """
+        the document was busy. that alone isn't a change (autosave locks it
+        too), so once it has been left alone it is only compared with how it
+        was at the last refresh, and refreshed if it turns out to differ.
+        """
+        cd.evidence |= cls.EvidenceLock
+        cls.scheduleCheck(cd)
+        ODD.wakeDocStatePoll()
+    
+    @classmethod
+    def scheduleCheck(cls, cd):
+        """
+        look at cd's document once it has been left alone for refreshDelay.
+        """
+        cd.deferred = False
+        if cd.refreshDelay <= 0:
+            cd.changeTime = monotonic_ns()
+            if cls.pendingCount == 0:
+                cls.pendingCount = 1
+                cls.removeStopper(cls.StopReasonNoChanges)
+        
+        # reset refresh delay so long as doc being changed.
+        cd.refreshDelay = cls.refreshDelay
+        
+        # check frequently again while a change is underway.
+        cls.adaptCheckInterval(True)
     
     @classmethod
     def checkTimerTimeout(cls):
         #logger.debug("checkTimerTimeout")
         doc = ODD.activeDocument
+        sawChange = False
+        
+        if doc and cls.changedDoc and not cls.changedDoc.docData.undoStackConfirmed:
+            if cls.findChangedDoc(cls.changedDoc.docData) is not cls.changedDoc:
+                # couldn't acquire lock for a document that was closed.
+                logger.error("tried to poll a document that was closed. this shouldn't happen.")
+                return
+            sawChange |= cls.pollDocument(cls.changedDoc.docData)
         
-        if doc:
-            if doc.tryBarrierLock():
-                # doc was not busy.
-                doc.unlock()
-                if cls.changedDoc["busyLastCheck"]:
-                    # doc has just finished being busy.
-                    # invalidate thumbs again at end (less costly than
-                    # invalidating constantly while busy). ditto time.
-                    cls.changedDoc["changeTime"] = process_time_ns()
-                    ODD.invalidateThumbnails(doc)
-                cls.changedDoc["busyLastCheck"] = False
+        # poll a limited number of the other documents each tick, taking turns.
+        count = len(ODD.documents)
+        polls = 0
+        for i in range(count):
+            if polls == cls.backgroundPollsPerTick:
+                break
+            cls.pollIndex = (cls.pollIndex + 1) % count
+            docData = ODD.documents[cls.pollIndex]
+            if docData.undoStackConfirmed or (cls.changedDoc and docData is cls.changedDoc.docData):
+                continue
+            sawChange |= cls.pollDocument(docData)
+            polls += 1
+        
+        cls.adaptCheckInterval(sawChange)
+    
+    @classmethod
+    def pollDocument(cls, docData):
+        """
+        returns True if the document was busy.
+        """
+        doc = docData.document
+        cd = cls.findChangedDoc(docData)
+        
+        # a save clears modified, an edit sets it. only the latter is evidence of change.
+        modified = doc.modified()
+        becameModified = modified and not docData.wasModified
+        docData.wasModified = modified
+        
+        if doc.tryBarrierLock():
+            # doc was not busy.
+            doc.unlock()
+            if cd and cd.busyLastCheck:
+                # doc has just finished being busy. thumbs made while it
+                # was busy may be out of date, so don't count them.
+                cd.changeTime = monotonic_ns()
+                cd.busyLastCheck = False
+            if becameModified:
+                # changed between checks.
+                cls.markChanged(cls.changedDocForDocData(docData), cls.EvidenceModified)
+                return True
+            return False
+        else:
+            # doc was busy.
+            if not becameModified and cls.isSaving(docData):
+                # lock is most likely the tail end of a save.
+                return False
+            if not cd:
+                cd = cls.changedDocForDocData(docData)
+            if becameModified:
+                cls.markChanged(cd, cls.EvidenceLock | cls.EvidenceModified)
             else:
-                if not any(dd["document"] == doc for dd in ODD.documents):
-                    # couldn't acquire lock for a document that was closed.
-                    logger.error("tried to acquire lock for a document that was closed. this shouldn't happen.")
-                    return 
-                # doc was busy.
-                if cls.changedDoc["hasChanged"]:
-                    # doc already known to be changed.
-                    pass
-                else:
-                    # doc has newly become busy, a change has begun.
-                    logger.debug("ODDImageChangeDetector: detected change in %s", cls.changedDoc["docData"]["document"].fileName())
-                    cls.changedDoc["hasChanged"] = True
-                    cls.changedDoc["changeTime"] = process_time_ns()
-                    if cls.pendingCount == 0:
-                        cls.pendingCount = 1
-                        cls.removeStopper(cls.StopReasonNoChanges)
-                    ODD.invalidateThumbnails(doc)
-                
-                # reset refresh delay so long as doc being changed.
-                cls.changedDoc["refreshDelay"] = cls.refreshDelay
-                
-                cls.changedDoc["busyLastCheck"] = True
+                cls.noteLock(cd)
+            cd.busyLastCheck = True
+            return True
+    
+    @classmethod
+    def isSaving(cls, docData):
+        """
+        True if docData was saved within the last saveWindow ms, so a lock on
+        it is most likely the save (or the autosave or export around it).
+        """
+        return monotonic_ns() - docData.saveTime < cls.saveWindow * 1000000
+    
+    @classmethod
+    def sampleDocument(cls, docData):
+        """
+        the image scaled down to the size of its largest thumbnail (at most
+        sampleSizeMax), so that each pixel is the average of the part of the
+        image one thumbnail pixel shows. one call, however big the image.
+        """
+        doc = docData.document
+        w = doc.width()
+        h = doc.height()
+        if w == 0 or h == 0 or not docData.thumbnails:
+            return None
+        thumbKey = max(docData.thumbnails, key=lambda k: k[0]*k[1])
+        if thumbKey[0] == 0 or thumbKey[1] == 0:
+            return None
+        scale = min(1.0, cls.sampleSizeMax / max(thumbKey[0], thumbKey[1]))
+        img = doc.thumbnail(max(1, round(thumbKey[0] * scale)), max(1, round(thumbKey[1] * scale)))
+        if img.isNull():
+            return None
+        img = img.convertToFormat(QImage.Format_ARGB32)
+        return ((w, h, img.width(), img.height()), img.constBits().asstring(img.sizeInBytes()))
+    
+    @classmethod
+    def compareSamples(cls, a, b):
+        """
+        ChangeNone if the samples are the same, ChangeVisible if they still
+        differ with their channels quantized to steps of sampleThreshold on
+        both grids, else ChangeSubtle. a single channel moving by less than
+        half a step can only cross a step on one of the grids, one moving by
+        a whole step or more crosses a step on both.
+        """
+        if a is None or b is None or a[0] != b[0]:
+            return cls.ChangeVisible
+        if a[1] == b[1]:
+            return cls.ChangeNone
+        for table in cls.sampleQuantizeTables:
+            if a[1].translate(table) == b[1].translate(table):
+                return cls.ChangeSubtle
+        return cls.ChangeVisible
+    
+    @classmethod
+    def checkDocument(cls, cd):
+        """
+        compare the image with how it was at the last refresh, and refresh if
+        it looks different enough. subtle changes are skipped, but they
+        accumulate against the same baseline, a refresh is forced after
+        maxSkippedChanges skips, and one is made anyway if the document is
+        left alone for deferredRefreshDelay.
+        """
+        docData = cd.docData
+        samples = cls.sampleDocument(docData)
+        change = cls.compareSamples(samples, docData.changeSamples)
+        if change == cls.ChangeNone:
+            if cd.hasChanged:
+                logger.debug("ODDImageChangeDetector: %s looks the same as at the last refresh, skip refresh.", docData.document.fileName())
+                # the thumbnails still show it as it is.
+                for thumbData in docData.thumbnails.values():
+                    if thumbData.valid and not thumbData.generator:
+                        thumbData.generation = docData.generation
+            cd.hasChanged = False
+            return
+        if change == cls.ChangeSubtle and docData.skippedChanges < cls.maxSkippedChanges:
+            logger.debug("ODDImageChangeDetector: change to %s too small to see in thumbnails, refresh later.", docData.document.fileName())
+            docData.skippedChanges += 1
+            cd.hasChanged = True
+            cd.deferred = True
+            ODDIdleGovernor.startTimer(cls.deferredRefreshTimer)
+            return
+        cls.refreshDocument(cd, samples)
+    
+    @classmethod
+    def refreshDocument(cls, cd, samples):
+        docData = cd.docData
+        docData.changeSamples = samples
+        docData.skippedChanges = 0
+        cd.hasChanged = False
+        cd.deferred = False
+        docData.generation += 1
+        ODD.invalidateThumbnails(docData)
+        # let everyone who needs to know, know it's time to refresh.
+        logger.debug("ODDImageChangeDetector: time to refresh %s", docData.document.fileName())
+        for docker in ODD.dockers:
+            docker.updateDocumentThumbnail(docData.document, ignoreThumbsMoreRecentThan=cd.changeTime)
+    
+    @classmethod
+    def deferredRefreshTimerTimeout(cls):
+        ODDIdleGovernor.forgetTimer(cls.deferredRefreshTimer)
+        for cd in list(cls.changedDocs.values()):
+            if not cd.deferred:
+                continue
+            if ODD.documentIsBusy(cd.docData.document):
+                # go around.
+                ODDIdleGovernor.startTimer(cls.deferredRefreshTimer)
+                continue
+            logger.debug("ODDImageChangeDetector: catch up on skipped changes to %s.", cd.docData.document.fileName())
+            cls.refreshDocument(cd, cls.sampleDocument(cd.docData))
+        
+        for key in [k for k,cd in cls.changedDocs.items() if not (cd is cls.changedDoc or cd.hasChanged or cd.refreshDelay > 0)]:
+            del cls.changedDocs[key]
     
     @classmethod
     def refreshCheckTimerTimeout(cls):
         pendingCount = 0
-        for cd in cls.changedDocs:
-            if cd["refreshDelay"] > 0:
-                cd["refreshDelay"] -= cls.refreshCheckTimer.interval()
-                if cd["refreshDelay"] <= 0:
-                    cdDoc = cd["docData"]["document"]
+        for cd in cls.changedDocs.values():
+            if cd.refreshDelay > 0:
+                cd.refreshDelay -= cls.refreshCheckTimer.interval()
+                if cd.refreshDelay <= 0:
+                    cdDoc = cd.docData.document
                     if not cdDoc.tryBarrierLock():
                         # go around.
-                        cd["refreshDelay"] = cls.refreshDelay
+                        cd.refreshDelay = cls.refreshDelay
                         pendingCount += 1
                         continue
                     cdDoc.unlock()
-                    cd["refreshDelay"] = 0
-                    cd["hasChanged"] = False
-                    # let everyone who needs to know, know it's time to refresh.
-                    logger.debug("ODDImageChangeDetector: time to refresh %s", cdDoc.fileName())
-                    for docker in ODD.dockers:
-                        docker.updateDocumentThumbnail(cdDoc, ignoreThumbsMoreRecentThan=cd["changeTime"])
+                    cd.refreshDelay = 0
+                    cd.evidence = 0
+                    cls.checkDocument(cd)
                 else:
                     pendingCount += 1
         
-        i = 0
-        while i < len(cls.changedDocs):
-            cd = cls.changedDocs[i]
-            if not (cd == cls.changedDoc or cd["hasChanged"]):
-                del cls.changedDocs[i]
-            else:
-                i += 1
+        for key in [k for k,cd in cls.changedDocs.items() if not (cd is cls.changedDoc or cd.hasChanged or cd.refreshDelay > 0)]:
+            del cls.changedDocs[key]
         
         cls.pendingCount = pendingCount
         if cls.pendingCount == 0:
@@ -211,3 +666,4 @@ class ODDImageChangeDetector(QObject):
 
 from .odddocker import ODDDocker
 from .oddsettings import ODDSettings, convertSettingStringToValue
+from .oddidlegovernor import ODDIdleGovernor
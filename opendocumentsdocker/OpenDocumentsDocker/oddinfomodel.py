@@ -0,0 +1,125 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QStandardItemModel, QStandardItem
+from time import monotonic_ns
+from pathlib import Path
+from .odd import ODD
+
+import logging
+logger = logging.getLogger("odd")
+
+
+class ODDInfoModel(QStandardItemModel):
+    """
+    model for the docker's info view. a row for each document, with a child
+    row for each of its cached thumbnails. update() only touches the cells
+    whose value has changed. each cell keeps the value it sorts by in SortRole.
+    """
+    SortRole = Qt.UserRole
+    ColumnName, ColumnMemory, ColumnUsers, ColumnLastUse, ColumnState = range(5)
+    
+    # sorts thumbnails that are in use before any that are not.
+    InUseSortValue = -(1 << 62)
+    
+    def __init__(self, parent=None):
+        super(ODDInfoModel, self).__init__(0, 5, parent)
+        self.setHorizontalHeaderLabels(["Item", "Memory", "Users", "Last use", "State"])
+        self.docRows = {}
+        self.thumbRows = {}
+        self.totalThumbBits = 0
+    
+    def newRow(self, parent):
+        row = [QStandardItem() for i in range(self.columnCount())]
+        for item in row:
+            item.setEditable(False)
+        parent.appendRow(row)
+        return row
+    
+    def setCell(self, row, column, text, sortValue=None):
+        item = row[column]
+        if sortValue is None:
+            sortValue = text
+        if item.data(self.SortRole) != sortValue:
+            item.setData(sortValue, self.SortRole)
+        if item.text() != text:
+            item.setText(text)
+    
+    def ageText(ns):
+        s = ns // 1000000000
+        if s < 1:
+            return "<1s ago"
+        elif s < 60:
+            return "{}s ago".format(s)
+        elif s < 3600:
+            return "{}m ago".format(s // 60)
+        return "{}h ago".format(s // 3600)
+    
+    def update(self, qwin):
+        now = monotonic_ns()
+        root = self.invisibleRootItem()
+        seenDocIds = set()
+        seenThumbKeys = set()
+        totalThumbBits = 0
+        
+        for docData in ODD.documents:
+            docId = docData.id
+            seenDocIds.add(docId)
+            row = self.docRows.get(docId)
+            if not row:
+                row = self.newRow(root)
+                self.docRows[docId] = row
+                row[self.ColumnName].setToolTip("opened {}".format(docData.created))
+            
+            doc = docData.document
+            self.setCell(row, self.ColumnName, Path(doc.fileName()).name or "[not saved]")
+            memory = docData.memoryUsage()
+            self.setCell(row, self.ColumnMemory, "{:1.2f}kb".format(memory/1024), memory)
+            viewsThisWindowCount = docData.viewCountPerWindow.get(qwin, 0)
+            viewsCount = sum(docData.viewCountPerWindow.values())
+            self.setCell(row, self.ColumnUsers, "{} view{} ({} here)".format(viewsCount, "" if viewsCount==1 else "s", viewsThisWindowCount), viewsCount)
+            self.setCell(row, self.ColumnState, "modified" if docData.stateModified else "")
+            
+            docInUse = False
+            docLastUsed = 0
+            for thumbKey,thumbData in docData.thumbnails.items():
+                key = (docId, thumbKey)
+                seenThumbKeys.add(key)
+                thumbRow = self.thumbRows.get(key)
+                if not thumbRow:
+                    thumbRow = self.newRow(row[self.ColumnName])
+                    self.thumbRows[key] = thumbRow
+                    self.setCell(thumbRow, self.ColumnName, "{}x{}".format(thumbKey[0], thumbKey[1]), thumbKey[0] * thumbKey[1])
+                
+                totalThumbBits += thumbData.size
+                userCount = len(thumbData.users)
+                self.setCell(thumbRow, self.ColumnMemory, "{:1.2f}kb".format(thumbData.size/8/1024), thumbData.size//8)
+                self.setCell(thumbRow, self.ColumnUsers, str(userCount), userCount)
+                if userCount > 0:
+                    docInUse = True
+                    self.setCell(thumbRow, self.ColumnLastUse, "in use", self.InUseSortValue)
+                else:
+                    docLastUsed = max(docLastUsed, thumbData.lastUsed)
+                    self.setCell(thumbRow, self.ColumnLastUse, ODDInfoModel.ageText(now - thumbData.lastUsed), -thumbData.lastUsed)
+                gen = thumbData.generator
+                state = "generating ({:1.0f}%)".format(gen.progress()*100) if gen else "" if thumbData.valid else "outdated"
+                self.setCell(thumbRow, self.ColumnState, state)
+            
+            if docInUse:
+                self.setCell(row, self.ColumnLastUse, "in use", self.InUseSortValue)
+            elif docLastUsed:
+                self.setCell(row, self.ColumnLastUse, ODDInfoModel.ageText(now - docLastUsed), -docLastUsed)
+            else:
+                self.setCell(row, self.ColumnLastUse, "", 0)
+        
+        # thumbnail rows of closed documents go with their document's row.
+        for key in [key for key in self.thumbRows if not key in seenThumbKeys]:
+            thumbRow = self.thumbRows.pop(key)
+            if key[0] in seenDocIds:
+                parent = thumbRow[self.ColumnName].parent()
+                parent.removeRow(thumbRow[self.ColumnName].row())
+        for docId in [docId for docId in self.docRows if not docId in seenDocIds]:
+            row = self.docRows.pop(docId)
+            root.removeRow(row[self.ColumnName].row())
+        
+        self.totalThumbBits = totalThumbBits
@@ -1,6 +1,7 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from PyQt5.QtCore import Qt, QPoint, QPointF
+from bisect import bisect_left, bisect_right
 from PyQt5.QtWidgets import QListWidget, QScroller, QAbstractItemView
 from krita import *
 from .odd import ODD
@@ -10,7 +11,38 @@ import logging
 logger = logging.getLogger("odd")
 
 
+class ODDDrawEntry:
+    """
+    what paintEvent needs to know about one list item, kept between paints.
+    rect is in contents coordinates. the crop rect is kept for the pixmap
+    and item size it was worked out for.
+    """
+    __slots__ = (
+            "row", "item", "docId", "rect", "isActive", "isHovered", "isSelected",
+            "viewsThisWindowCount", "viewsOtherWindowsCount", "cropKey", "cropRect",
+    )
+    
+    def __init__(self, row, item, docId):
+        self.row = row
+        self.item = item
+        self.docId = docId
+        self.rect = None
+        self.isActive = False
+        self.isHovered = False
+        self.isSelected = False
+        self.viewsThisWindowCount = 0
+        self.viewsOtherWindowsCount = 0
+        self.cropKey = None
+        self.cropRect = None
+
+
 class ODDListWidget(QListWidget):
+    # parts of the list that scheduleUpdate can mark as needing work.
+    DirtyLayout = 1
+    DirtyDrawList = 2
+    DirtyScrollRange = 4
+    DirtyPaint = 8
+    
     def __init__(self, odd, oddDocker):
         self.odd = odd
         self.oddDocker = oddDocker
@@ -22,7 +54,11 @@ class ODDListWidget(QListWidget):
         self._doNotRecacheItemRects = False
         self._childrenExtent = 0
         self._childrenRect = QRect(0, 0, 0, 0)
-        self._itemsToDraw = []
+        self._itemRectsLanes = []
+        self._rowByDocId = {}
+        self._drawEntries = []
+        self._drawActiveRow = -1
+        self._drawHoveredRow = -1
         self._isItemsToDrawDirty = True
         super(ODDListWidget, self).__init__()
         self.horizontalScrollBar().installEventFilter(self)
@@ -33,6 +69,12 @@ class ODDListWidget(QListWidget):
         self.unfadeDelayTimer.setSingleShot(True)
         self.unfadeDelayTimer.timeout.connect(self.unfadeDelayTimerTimeout)
         
+        self._dirtyFlags = 0
+        self.scheduledUpdateTimer = QTimer(self)
+        self.scheduledUpdateTimer.setInterval(0)
+        self.scheduledUpdateTimer.setSingleShot(True)
+        self.scheduledUpdateTimer.timeout.connect(self.flushScheduledUpdates)
+        
         self.hideScrollBars = False
         if Application.readSetting("", "KineticScrollingEnabled", "true") == "true":
             self.setupScroller(QScroller.scroller(self))
@@ -98,9 +140,7 @@ class ODDListWidget(QListWidget):
     def eventFilter(self, obj, event):
         if obj in (self.horizontalScrollBar(), self.verticalScrollBar()):
             if event.type() == QEvent.Enter:
-                if self.itemHovered:
-                    self.itemHovered = None
-                    self._isItemsToDrawDirty = True
+                self.itemHovered = None
                 self.oddDocker.listToolTip.hide()
                 self.viewport().update()
         return False
@@ -120,7 +160,6 @@ class ODDListWidget(QListWidget):
     def leaveEvent(self, event):
         if self.itemHovered:
             self.itemHovered = None
-            self._isItemsToDrawDirty = True
             self.oddDocker.listToolTip.hide()
         self.mouseEntered = False
         self.viewport().update()
@@ -131,13 +170,35 @@ class ODDListWidget(QListWidget):
         if not self.itemHovered:
             if oldItemHovered:
                 self.oddDocker.listToolTip.hide()
-                self._isItemsToDrawDirty = True
-                self.viewport().update()
+                self.scheduleUpdate(self.DirtyPaint)
         else:
             if self.itemHovered != oldItemHovered:
                 self.oddDocker.itemEntered(self.itemHovered)
-                self._isItemsToDrawDirty = True
-                self.viewport().update()
+                self.scheduleUpdate(self.DirtyPaint)
+    
+    def scheduleUpdate(self, flags):
+        """
+        mark parts of the list as needing work. everything marked is resolved
+        once, in a fixed order, when control returns to the event loop.
+        item rects are invalidated straight away (they are only recalculated
+        when next asked for), so code that reads them meanwhile sees the new
+        layout.
+        """
+        if flags & self.DirtyLayout:
+            self.invalidateItemRectsCache()
+        self._dirtyFlags |= flags
+        if not self.scheduledUpdateTimer.isActive():
+            self.scheduledUpdateTimer.start()
+    
+    def flushScheduledUpdates(self):
+        flags = self._dirtyFlags
+        self._dirtyFlags = 0
+        if flags & self.DirtyDrawList:
+            self._isItemsToDrawDirty = True
+        if flags & (self.DirtyLayout | self.DirtyScrollRange):
+            self.updateGeometries()
+        if flags:
+            self.viewport().update()
     
     def invalidateItemRectsCache(self):
         #logger.debug("itemRects cache invalidated")
@@ -167,6 +228,7 @@ class ODDListWidget(QListWidget):
         logger.debug("regenerate itemRects cache")
         self._itemRectsRecaching = True
         itemRects = []
+        itemLanes = []
         
         isListVertical = self.flow() == QListView.TopToBottom
         
@@ -183,11 +245,11 @@ class ODDListWidget(QListWidget):
                 stackCount = 1
             
             if gridMode == "masonry":
-                self._itemRectsMasonryLayout(itemRects, count, isListVertical, idealSize, stackCount)
+                self._itemRectsMasonryLayout(itemRects, itemLanes, count, isListVertical, idealSize, stackCount)
             else:
-                self._itemRectsGridLayout(itemRects, count, isListVertical, idealSize, stackCount, gridMode in ["stretchToFit", "cropToFit"])
+                self._itemRectsGridLayout(itemRects, itemLanes, count, isListVertical, idealSize, stackCount, gridMode in ["stretchToFit", "cropToFit"])
         else:
-            self._itemRectsBasicLayout(itemRects, count, isListVertical)
+            self._itemRectsBasicLayout(itemRects, itemLanes, count, isListVertical)
         
         self._childrenExtent = 0
         for i in range(count):
@@ -197,11 +259,87 @@ class ODDListWidget(QListWidget):
                 self._childrenExtent = pos
         
         self._itemRects = itemRects
+        self._buildItemRectsIndex(itemRects, itemLanes, count, isListVertical)
         self._itemRectsValid = True
         self._itemRectsRecaching = False
         return self._itemRects
+    
+    def _buildItemRectsIndex(self, itemRects, itemLanes, count, isListVertical):
+        """
+        index the item rects by lane. the layouts place items so that no two
+        in the same lane (the list, a grid column/row position, or a masonry
+        stack) overlap along the scroll axis, and each lane's items are in
+        order along it. so within a lane, the only item that can contain a
+        point is the last one starting before it.
+        """
+        lanes = {}
+        self._rowByDocId = {}
+        for i in range(count):
+            self._rowByDocId[self.item(i).data(self.oddDocker.ItemDocumentIdRole)] = i
+            lane = itemLanes[i]
+            if lane < 0:
+                # hidden item.
+                continue
+            r = itemRects[i]
+            if not lane in lanes:
+                lanes[lane] = ([], [])
+            lanes[lane][0].append(r.y() if isListVertical else r.x())
+            lanes[lane][1].append(i)
+        self._itemRectsLanes = list(lanes.values())
+    
+    def rowForItem(self, item):
+        if not item:
+            return -1
+        return self._rowByDocId.get(item.data(self.oddDocker.ItemDocumentIdRole), -1)
+    
+    def rowAtContentsPoint(self, point):
+        """
+        row of the item under point (in contents coordinates), or -1.
+        """
+        itemRects = self.itemRects()
+        if not itemRects:
+            return -1
+        pos = point.y() if self.flow() == QListView.TopToBottom else point.x()
+        for starts, rows in self._itemRectsLanes:
+            j = bisect_right(starts, pos) - 1
+            if j >= 0 and itemRects[rows[j]].contains(point):
+                return rows[j]
+        return -1
+    
+    def rowsInContentsRange(self, start, end):
+        """
+        rows, in order, of the visible items that overlap start-end along
+        the scroll axis (in contents coordinates).
+        """
+        itemRects = self.itemRects()
+        if not itemRects:
+            return []
+        isListVertical = self.flow() == QListView.TopToBottom
+        result = []
+        for starts, rows in self._itemRectsLanes:
+            lo = max(0, bisect_right(starts, start) - 1)
+            r = itemRects[rows[lo]]
+            if (r.bottom() if isListVertical else r.right()) < start:
+                lo += 1
+            hi = bisect_left(starts, end)
+            result.extend(rows[lo:hi])
+        result.sort()
+        return result
+    
+    def visibleRows(self):
+        """
+        rows of the items that are scrolled into view.
+        """
+        if not self.oddDocker.vs.readSetting("display") == "thumbnails":
+            return range(self.count())
+        if self.flow() == QListView.TopToBottom:
+            start = self.verticalScrollBar().value()
+            return self.rowsInContentsRange(start, start + self.viewport().height())
+        else:
+            start = self.horizontalScrollBar().value()
+            return self.rowsInContentsRange(start, start + self.viewport().width())
             
-    def _itemRectsBasicLayout(self, itemRects, count, isListVertical):
+    def _itemRectsBasicLayout(self, itemRects, itemLanes, count, isListVertical):
         if isListVertical:
             x = y = xExt = 0
             yExt = 2
@@ -212,15 +350,17 @@ class ODDListWidget(QListWidget):
             item = self.item(i)
             if item.isHidden():
                 itemRects.append(QRect(0,0,0,0))
+                itemLanes.append(-1)
                 continue
             size = self.oddDocker.calculateDisplaySizeForThumbnail(item.data(self.oddDocker.ItemDocumentSizeRole), False, True)
             itemRects.append(QRect(x, y, size.width(), size.height()))
+            itemLanes.append(0)
             if isListVertical:
                 y += size.height() + yExt
             else:
                 x += size.width() + xExt
     
-    def _itemRectsGridLayout(self, itemRects, count, isListVertical, idealSize, stackCount, isEveryItemSquare):
+    def _itemRectsGridLayout(self, itemRects, itemLanes, count, isListVertical, idealSize, stackCount, isEveryItemSquare):
         x = y = stack = 0
         previousSize = QSize(0, 0)
         
@@ -228,6 +368,7 @@ class ODDListWidget(QListWidget):
             item = self.item(i)
             if item.isHidden():
                 itemRects.append(QRect(0,0,0,0))
+                itemLanes.append(-1)
                 continue
             if stack == stackCount:
                 if isListVertical:
@@ -245,13 +386,14 @@ class ODDListWidget(QListWidget):
                 size = self.oddDocker.calculateDisplaySizeForThumbnail(item.data(self.oddDocker.ItemDocumentSizeRole))
                 previousSize = QSize(max(previousSize.width(), size.width()), max(previousSize.height(), size.height()))
             itemRects.append(QRectF(x, y, size.width(), size.height()).toRect())
+            itemLanes.append(stack)
             if isListVertical:
                 x += size.width()
             else:
                 y += size.height()
             stack += 1
     
-    def _itemRectsMasonryLayout(self, itemRects, count, isListVertical, idealSize, stackCount):
+    def _itemRectsMasonryLayout(self, itemRects, itemLanes, count, isListVertical, idealSize, stackCount):
         stacksPos = []
         stacksEnd = []
         pos = stack = 0
@@ -265,6 +407,7 @@ class ODDListWidget(QListWidget):
             item = self.item(i)
             if item.isHidden():
                 itemRects.append(QRect(0,0,0,0))
+                itemLanes.append(-1)
                 continue
             docSize = item.data(self.oddDocker.ItemDocumentSizeRole)
             itemSize = self.oddDocker.calculateDisplaySizeForThumbnail(docSize, True, True)
@@ -279,6 +422,7 @@ class ODDListWidget(QListWidget):
                 stacksEnd[stack] += itemSize.width()
             
             itemRects.append(QRectF(x, y, itemSize.width(), itemSize.height()).toRect())
+            itemLanes.append(stack)
             
             stack = stacksEnd.index(min(stacksEnd))
     
@@ -301,23 +445,18 @@ class ODDListWidget(QListWidget):
         if not self.oddDocker.vs.readSetting("display") == "thumbnails":
             return super().indexAt(point)
         
-        itemRects = self.itemRects()
-        count = self.count()
-        point += QPoint(self.horizontalScrollBar().value(), self.verticalScrollBar().value())
-        for i in range(0, count):
-            if itemRects[i].contains(point):
-                return self.indexFromItem(self.item(i))
-        return self.indexFromItem(None)
+        row = self.rowAtContentsPoint(point + QPoint(self.horizontalScrollBar().value(), self.verticalScrollBar().value()))
+        return self.indexFromItem(self.item(row) if row >= 0 else None)
     
     def visualItemRect(self, item):
         if not self.oddDocker.vs.readSetting("display") == "thumbnails":
             return super().visualItemRect(item)
         
         itemRects = self.itemRects()
-        count = self.count()
-        for i in range(0, count):
-            if self.item(i) == item:
-                return itemRects[i].translated(-self.horizontalScrollBar().value(), -self.verticalScrollBar().value())
+        row = self.rowForItem(item) if itemRects else -1
+        if row < 0 or row >= len(itemRects):
+            return QRect()
+        return itemRects[row].translated(-self.horizontalScrollBar().value(), -self.verticalScrollBar().value())
     
     def childrenRect(self):
         if not self.oddDocker.vs.readSetting("display") == "thumbnails":
@@ -370,7 +509,7 @@ class ODDListWidget(QListWidget):
             return
         
         qwin = self.oddDocker.parent()
-        activeDoc = ODD.activeDocument
+        activeDocId = ODD.activeDocId
         #logger.debug("paintEvent: %s", event.rect())
         option = self.viewOptions()
         painter = QPainter(self.viewport())
@@ -438,81 +577,46 @@ class ODDListWidget(QListWidget):
             QPointF(26/30, 20/30), QPointF(26/30, 16/30), QPointF(32/30, 16/30),
         ]
         
-        # make list of (item, itemRect, doc, isActive, isHovered, viewsThisWindowCount, viewsOtherWindowsCount) tuples.
-        # include only those that will be visible (not isHidden, not scrolled out of view).
-        # the list is ordered as follows: active item, hovered inactive item (if any), remaining items.
+        # draw the visible items, found by range query on the item rects index,
+        # in this order: active item, hovered inactive item (if any), remaining items.
         # the first three (active, hovered, first of remainder) will be drawn with their respective painter settings.
         # then all the rest will be drawn with no further changes.
         
-        hscroll = self.horizontalScrollBar().value()
-        vscroll = self.verticalScrollBar().value()
-        vpwidth = self.viewport().width()
-        vpheight= self.viewport().height()
-        
-        if self._isItemsToDrawDirty:
+        if self._isItemsToDrawDirty or len(self._drawEntries) != self.count():
             self._isItemsToDrawDirty = False
-            
-            viewCountPerWindow = [
-                    self.odd.docDataFromDocument(self.item(i).data(self.oddDocker.ItemDocumentRole))["viewCountPerWindow"]
-                    for i in range(count)
-            ]
-            
-            self.itemRects()
-            self._itemsToDraw = [
-                    (
-                            self.item(i),
-                            self._itemRects[i],
-                            self.item(i).data(self.oddDocker.ItemDocumentRole),
-                            self.item(i).data(self.oddDocker.ItemDocumentRole) == activeDoc,
-                            self.item(i) == self.itemHovered,
-                            (self.item(i) in self.selectedItems()),
-                            viewCountPerWindow[i][qwin] if qwin in viewCountPerWindow[i] else 0,
-                            sum(0 if k == qwin else v for k,v in viewCountPerWindow[i].items()),
-                    )
-                    for i in range(count)
-                    if not self.item(i).isHidden()
-            ]
-            self._itemsToDraw = sorted(self._itemsToDraw, key = lambda d: not d[4]) # sort by is itemHovered
-            self._itemsToDraw = sorted(self._itemsToDraw, key = lambda d: not d[3]) # sort by is activeDoc
-            
-        # translate item rects and remove out-of-view items.
-        itemsToDraw = [
-                (i[0], i[1].translated(-hscroll, -vscroll), i[2], i[3], i[4], i[5], i[6], i[7])
-                for i in self._itemsToDraw
-        ]
+            self._rebuildDrawEntries(qwin, activeDocId)
+        else:
+            self._updateDrawEntryStates(activeDocId)
         
-        itemsToDraw = list(filter(
-                lambda v: (not (v[1].bottom() < 0 or v[1].y() > vpheight)) if self.flow() == QListView.TopToBottom \
-                          else (not (v[1].right() < 0 or v[1].x() > vpwidth)),
-                itemsToDraw
-        ))
+        entries = self._drawEntries
+        rows = self.visibleRows()
+        firstRows = []
+        for row in (self._drawActiveRow, self._drawHoveredRow):
+            if row >= 0 and not row in firstRows and row in rows:
+                firstRows.append(row)
+        itemsToDraw = [entries[row] for row in firstRows]
+        itemsToDraw.extend(entries[row] for row in rows if not row in firstRows)
         
         if len(itemsToDraw) == 0:
             return
         
-        # ~ for i in enumerate(itemsToDraw):
-            # ~ # print(i[0], i[1])
-            # ~ print("#{}: pos in doc list: {}, doc: {}, itemrect: {}, isActive: {}, isHovered: {}, in selectedItems: {}, views this/other wins: {}/{}".format(
-                    # ~ i[0],
-                    # ~ ODD.documents.index(ODD.docDataFromDocument(i[1][0].data(self.oddDocker.ItemDocumentRole))),
-                    # ~ ODD.documentDisplayName(i[1][2]),
-                    # ~ i[1][1], i[1][3], i[1][4], i[1][5], i[1][6], i[1][7]
-            # ~ ))
+        # draw in contents coordinates.
+        painter.translate(-self.horizontalScrollBar().value(), -self.verticalScrollBar().value())
         
         # begin main draw loop.
         
         for i in range(3):
             
             # (s for special.)
-            s_item = itemsToDraw[i][0]
-            s_itemRect = itemsToDraw[i][1]
-            s_isItemActiveDoc = itemsToDraw[i][3]
-            s_isItemHovered = itemsToDraw[i][4]
+            s_item = itemsToDraw[i].item
+            s_itemRect = itemsToDraw[i].rect
+            s_isItemActiveDoc = itemsToDraw[i].isActive
+            s_isItemHovered = itemsToDraw[i].isHovered
             
             if i <= 3:
                 painter.setOpacity(
-                        opacityItemHoveredActive if (s_item == self.itemHovered and s_isItemActiveDoc) else (
-                                opacityItemHoveredNotActive if (s_item == self.itemHovered) else (
+                        opacityItemHoveredActive if (s_isItemHovered and s_isItemActiveDoc) else (
+                                opacityItemHoveredNotActive if (s_isItemHovered) else (
                                         opacityListHoveredActive if (self.mouseEntered and s_isItemActiveDoc) else (
                                                 opacityListHoveredNotActive if (self.mouseEntered) else (
                                                         opacityNotHoveredActive if s_isItemActiveDoc else opacityNotHoveredNotActive
@@ -528,41 +632,22 @@ class ODDListWidget(QListWidget):
             
             # draw pixmap.
             for itemToDraw in range(rStart, rEnd):
-                item, itemRect = itemsToDraw[itemToDraw][0], itemsToDraw[itemToDraw][1]
-                #option.rect, option.showDecorationSelected = itemRect, itemsToDraw[itemToDraw][5]
-                option.showDecorationSelected = itemsToDraw[itemToDraw][5]
+                entry = itemsToDraw[itemToDraw]
+                item, itemRect = entry.item, entry.rect
+                #option.rect, option.showDecorationSelected = itemRect, entry.isSelected
+                option.showDecorationSelected = entry.isSelected
                 pm, x, y, w, h = item.data(Qt.DecorationRole), itemRect.x(), itemRect.y(), itemRect.width(), itemRect.height()
                 
                 if pm:
                     if isStretchToFit:
                         painter.drawPixmap(itemRect, pm)
                     else:
-                        cropRect = pm.rect()
-                        itemRatio = h/w
-                        pmRatio = pm.height()/pm.width()
-                        if pmRatio < 1.0:
-                            itemToPmScale = pm.height() / h
-                            cropWidth = w * itemToPmScale
-                            cropRect.setWidth(round(cropWidth))
-                            cropRect.moveLeft(round((pm.width() - cropWidth) / 2))
-                            #logger.debug("%s %s %s %s", itemRect, pm.rect(), itemToPmScale, cropRect)
-                        elif pmRatio > 1.0:
-                            itemToPmScale = pm.width() / w
-                            cropHeight = h * itemToPmScale
-                            cropRect.setHeight(round(cropHeight))
-                            cropRect.moveTop(round((pm.height() - cropHeight) / 2))
-                            #logger.debug("%s %s %s %s", itemRect, pm.rect(), itemToPmScale, cropRect)
-                        cropRect.moveLeft(max(0, cropRect.left()))
-                        cropRect.moveTop(max(0, cropRect.top()))
-                        cropRect.setWidth(min(pm.width(), cropRect.width()))
-                        cropRect.setHeight(min(pm.height(), cropRect.height()))
-                        #logger.debug("#"+str(i)+": %s %s %s", itemRect, QRect(0,0,pm.width(),pm.height()), cropRect)
-                        painter.drawPixmap(itemRect, pm, cropRect)
+                        painter.drawPixmap(itemRect, pm, self._cropRectForEntry(entry, pm))
             
             # draw active item border.
             if s_isItemActiveDoc:
                 item, itemRect = s_item, s_itemRect
-                option.rect, option.showDecorationSelected = itemRect, itemsToDraw[i][5]
+                option.rect, option.showDecorationSelected = itemRect, itemsToDraw[i].isSelected
                 x, y, w, h = itemRect.x(), itemRect.y(), itemRect.width(), itemRect.height()
                 
                 painter.setBrush(Qt.NoBrush)
@@ -576,9 +661,10 @@ class ODDListWidget(QListWidget):
             if canShowModIcon:
                 if isModIconTypeText:
                     for itemToDraw in range(rStart, rEnd):
-                        item, itemRect = itemsToDraw[itemToDraw][0], itemsToDraw[itemToDraw][1]
-                        #option.rect, option.showDecorationSelected = itemRect, itemsToDraw[itemToDraw][5]
-                        option.showDecorationSelected = itemsToDraw[itemToDraw][5]
+                        entry = itemsToDraw[itemToDraw]
+                        item, itemRect = entry.item, entry.rect
+                        #option.rect, option.showDecorationSelected = itemRect, entry.isSelected
+                        option.showDecorationSelected = entry.isSelected
                         x, y, w, h = itemRect.x(), itemRect.y(), itemRect.width(), itemRect.height()
                         
                         if item.data(self.oddDocker.ItemModifiedStatusRole) or modIconPreview != "":
@@ -601,9 +687,10 @@ class ODDListWidget(QListWidget):
                     painter.setBrush(brush)
                     painter.setPen(colorModIconLine)
                     for itemToDraw in range(rStart, rEnd):
-                        item, itemRect = itemsToDraw[itemToDraw][0], itemsToDraw[itemToDraw][1]
-                        #option.rect, option.showDecorationSelected = itemRect, itemsToDraw[itemToDraw][5]
-                        option.showDecorationSelected = itemsToDraw[itemToDraw][5]
+                        entry = itemsToDraw[itemToDraw]
+                        item, itemRect = entry.item, entry.rect
+                        #option.rect, option.showDecorationSelected = itemRect, entry.isSelected
+                        option.showDecorationSelected = entry.isSelected
                         x, y, w, h = itemRect.x(), itemRect.y(), itemRect.width(), itemRect.height()
                         
                         if item.data(self.oddDocker.ItemModifiedStatusRole) or modIconPreview != "":
@@ -621,9 +708,10 @@ class ODDListWidget(QListWidget):
                 painter.setPen(colorGridLine)
                 
                 for itemToDraw in range(rStart, rEnd):
-                    item, itemRect = itemsToDraw[itemToDraw][0], itemsToDraw[itemToDraw][1]
-                    #option.rect, option.showDecorationSelected = itemRect, itemsToDraw[itemToDraw][5]
-                    option.showDecorationSelected = itemsToDraw[itemToDraw][5]
+                    entry = itemsToDraw[itemToDraw]
+                    item, itemRect = entry.item, entry.rect
+                    #option.rect, option.showDecorationSelected = itemRect, entry.isSelected
+                    option.showDecorationSelected = entry.isSelected
                     x, y, w, h = itemRect.x(), itemRect.y(), itemRect.width(), itemRect.height()
                     
                     painter.drawLine(x, y+h-1, x+w-1, y+h-1)
@@ -639,11 +727,12 @@ class ODDListWidget(QListWidget):
             painter.setCompositionMode(QPainter.CompositionMode_Difference)
             
             for itemToDraw in range(rStart, rEnd):
-                viewsThisWindowCount = itemsToDraw[itemToDraw][6]
+                viewsThisWindowCount = itemsToDraw[itemToDraw].viewsThisWindowCount
                 if viewsThisWindowCount == 0:
-                    item, itemRect = itemsToDraw[itemToDraw][0], itemsToDraw[itemToDraw][1]
-                    #option.rect, option.showDecorationSelected = itemRect, itemsToDraw[itemToDraw][5]
-                    option.showDecorationSelected = itemsToDraw[itemToDraw][5]
+                    entry = itemsToDraw[itemToDraw]
+                    item, itemRect = entry.item, entry.rect
+                    #option.rect, option.showDecorationSelected = itemRect, entry.isSelected
+                    option.showDecorationSelected = entry.isSelected
                     x, y, w, h = itemRect.x(), itemRect.y(), itemRect.width(), itemRect.height()
                     
                     s = min(24, min(w, h))
@@ -665,6 +754,106 @@ class ODDListWidget(QListWidget):
             
         painter.end()
 
+    def _rebuildDrawEntries(self, qwin, activeDocId):
+        """
+        after the items or their layout changed. entries are kept by document,
+        so their crop rects survive if the item size didn't change.
+        """
+        itemRects = self.itemRects()
+        oldEntries = {entry.docId:entry for entry in self._drawEntries if entry}
+        hoveredRow = self.rowForItem(self.itemHovered)
+        entries = []
+        self._drawActiveRow = -1
+        self._drawHoveredRow = -1
+        for i in range(self.count()):
+            item = self.item(i)
+            if item.isHidden():
+                entries.append(None)
+                continue
+            docId = item.data(self.oddDocker.ItemDocumentIdRole)
+            entry = oldEntries.get(docId)
+            if entry:
+                entry.row = i
+                entry.item = item
+            else:
+                entry = ODDDrawEntry(i, item, docId)
+            entry.rect = itemRects[i]
+            entry.isActive = docId == activeDocId
+            entry.isHovered = i == hoveredRow
+            entry.isSelected = item.isSelected()
+            viewCountPerWindow = ODD.docDataFromId(docId).viewCountPerWindow
+            entry.viewsThisWindowCount = viewCountPerWindow[qwin] if qwin in viewCountPerWindow else 0
+            entry.viewsOtherWindowsCount = sum(0 if k == qwin else v for k,v in viewCountPerWindow.items())
+            if entry.isActive:
+                self._drawActiveRow = i
+            if entry.isHovered:
+                self._drawHoveredRow = i
+            entries.append(entry)
+        self._drawEntries = entries
+    
+    def _updateDrawEntryStates(self, activeDocId):
+        """
+        bring the active and hovered flags up to date, touching only the
+        entries that changed.
+        """
+        entries = self._drawEntries
+        activeRow = self._rowByDocId.get(activeDocId, -1)
+        if activeRow != self._drawActiveRow:
+            if self._drawActiveRow >= 0 and entries[self._drawActiveRow]:
+                entries[self._drawActiveRow].isActive = False
+            if activeRow >= 0 and entries[activeRow]:
+                entries[activeRow].isActive = True
+            self._drawActiveRow = activeRow
+        hoveredRow = self.rowForItem(self.itemHovered)
+        if hoveredRow != self._drawHoveredRow:
+            if self._drawHoveredRow >= 0 and entries[self._drawHoveredRow]:
+                entries[self._drawHoveredRow].isHovered = False
+            if hoveredRow >= 0 and entries[hoveredRow]:
+                entries[hoveredRow].isHovered = True
+            self._drawHoveredRow = hoveredRow
+    
+    def selectionChanged(self, selected, deselected):
+        super().selectionChanged(selected, deselected)
+        entries = self._drawEntries
+        if self._isItemsToDrawDirty or len(entries) != self.count():
+            return
+        for index in deselected.indexes():
+            if entry := entries[index.row()]:
+                entry.isSelected = False
+        for index in selected.indexes():
+            if entry := entries[index.row()]:
+                entry.isSelected = True
+    
+    def _cropRectForEntry(self, entry, pm):
+        """
+        the part of pm to draw so it fills the item rect without stretching.
+        """
+        w, h = entry.rect.width(), entry.rect.height()
+        cropKey = (pm.cacheKey(), w, h)
+        if entry.cropKey == cropKey:
+            return entry.cropRect
+        
+        cropRect = pm.rect()
+        pmRatio = pm.height()/pm.width()
+        if pmRatio < 1.0:
+            itemToPmScale = pm.height() / h
+            cropWidth = w * itemToPmScale
+            cropRect.setWidth(round(cropWidth))
+            cropRect.moveLeft(round((pm.width() - cropWidth) / 2))
+        elif pmRatio > 1.0:
+            itemToPmScale = pm.width() / w
+            cropHeight = h * itemToPmScale
+            cropRect.setHeight(round(cropHeight))
+            cropRect.moveTop(round((pm.height() - cropHeight) / 2))
+        cropRect.moveLeft(max(0, cropRect.left()))
+        cropRect.moveTop(max(0, cropRect.top()))
+        cropRect.setWidth(min(pm.width(), cropRect.width()))
+        cropRect.setHeight(min(pm.height(), cropRect.height()))
+        
+        entry.cropKey = cropKey
+        entry.cropRect = cropRect
+        return cropRect
+    
     def contextMenuEvent(self, event, viewOptionsOnly=False):
         logger.debug("ctx menu event - %s %s", event.globalPos(), event.reason())
         self.oddDocker.listToolTip.hide()
@@ -696,15 +885,7 @@ class ODDListWidget(QListWidget):
         docData = ODD.docDataFromDocument(doc)
         activeWin = Application.activeWindow()
         
-        views = []
-        for view in self.odd.views:
-            if view.document() == doc:
-                views.append(view)
-        wins = []
-        for view in views:
-            win = view.window()
-            if win not in wins:
-                wins.append(win)
+        wins = [ODD.windowFromQWindow(qwin) for qwin,viewIds in docData.viewIdsInWindow.items() if viewIds]
         
         clickedActionName = None
         
@@ -724,7 +905,7 @@ class ODDListWidget(QListWidget):
         viewMenu = menu#menu.addMenu("Views")
         for win in wins:
             a = viewMenu.addAction("View in " + win.qwindow().objectName())
-            if win == activeWin and win.activeView().document() == doc:
+            if win == activeWin and ODD.activeViewIdInWindow.get(win.qwindow()) in docData.viewIdsInWindow[win.qwindow()]:
                 a.setEnabled(False)
             a.setData(("goToViewInWin", win))
         a = viewMenu.addAction("New View in This Window")
@@ -734,11 +915,11 @@ class ODDListWidget(QListWidget):
         if not viewOptionsOnly:
             menu.addSeparator()
             a = menu.addAction("Close Views in This Window")
-            if docData["viewCountPerWindow"][activeWin.qwindow()] == 0 or len(wins) == 1:
+            if docData.viewCountPerWindow[activeWin.qwindow()] == 0 or len(wins) == 1:
                 a.setEnabled(False)
             a.setData(("closeViewsInThisWin", None))
             a = menu.addAction("Close Views in All Other Windows")
-            if docData["viewCountPerWindow"][activeWin.qwindow()] == 0 or len(wins) == 1:
+            if docData.viewCountPerWindow[activeWin.qwindow()] == 0 or len(wins) == 1:
                 a.setEnabled(False)
             a.setData(("closeViewsInOtherWins", None))
             menu.addSeparator()
@@ -775,17 +956,14 @@ class ODDListWidget(QListWidget):
                 win.activate()
                 qwin = win.qwindow()
                 toView = None
-                if qwin in docData["lastViewInWindow"]:
-                    toView = docData["lastViewInWindow"][qwin]
+                if qwin in docData.lastViewInWindow:
+                    toView = docData.lastViewInWindow[qwin]
                 else:
                     logger.warning("ctx menu: tried to go to view in win on doc with no lastViewInWindow for that win.\n" \
                                    "          you might have asked for a window that was still being created?")
                 if not toView:
-                    if win.activeView().document() != doc:
-                        for view in win.views():
-                            if view.document() == doc:
-                                toView = view
-                                break
+                    if viewsThisWin := ODD.viewsOfDocumentInWindow(docData, qwin):
+                        toView = viewsThisWin[0]
                 if toView:
                     win.showView(toView)
                     toView.setVisible()
@@ -803,7 +981,7 @@ class ODDListWidget(QListWidget):
                 newview.setVisible()
             elif aData[0] == "closeViewsInThisWin":
                 logger.info("close views in this window")
-                viewCount = docData["viewCountPerWindow"][activeWin.qwindow()]
+                viewCount = docData.viewCountPerWindow[activeWin.qwindow()]
                 self.viewCloser = ODDViewProcessor(
                     operation = lambda : Application.action('file_close').trigger(),
                     selectionCondition = lambda view : view.document() == doc and view.window() == activeWin,
@@ -815,7 +993,7 @@ class ODDListWidget(QListWidget):
             elif aData[0] == "closeViewsInOtherWins":
                 logger.info("close views in other windows")
                 qwin = activeWin.qwindow()
-                viewCount = sum(0 if k == qwin else v for k,v in docData["viewCountPerWindow"].items())
+                viewCount = sum(0 if k == qwin else v for k,v in docData.viewCountPerWindow.items())
                 self.viewCloser = ODDViewProcessor(
                     operation = lambda : Application.action('file_close').trigger(),
                     selectionCondition = lambda view : view.document() == doc and view.window() != activeWin,
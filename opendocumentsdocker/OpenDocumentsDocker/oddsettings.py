@@ -78,23 +78,34 @@ def formatFloatStandardToDecimal(f):
     return sign + digits + '0'*exponent + '.0'
 
 class ODDSettings(QObject):
+    # how much work the docker has to do after a setting changes.
+    # see applySettingImpact.
+    ImpactNone = 0          # nothing, or the setting's own handler does it.
+    ImpactPaint = 1         # repaint the list.
+    ImpactLayout = 2        # relayout the list, thumbnails can be kept.
+    ImpactRenderSize = 3    # relayout, and regenerate thumbnails not near the new size.
+    ImpactRenderMethod = 4  # regenerate every thumbnail.
+    
     # Settings Data
     isFirstRun = True
     instances = []
     SD = {
             "direction": {
                     "default":"auto",
+                    "impact" :ImpactLayout,
                     "flags"  :["perInstance"],
                     "initial":lambda self: self.setUiValuesForDirection(self.readSetting("direction")),
             },
             "display": {
                     "default":"thumbnails",
+                    "impact" :ImpactLayout,
                     "flags"  :["perInstance"],
                     "initial":lambda self: self.setUiValuesForDisplay(self.readSetting("display")),
             },
             "grid": {
                     "label"  :"Grid",
                     "default":"false",
+                    "impact" :ImpactRenderSize,
                     "depends": {
                         "dependsOn":["display"],
                         "evaluator":lambda self: self.settingValue("display", True) == "thumbnails",
@@ -103,6 +114,7 @@ class ODDSettings(QObject):
             },
             "gridMode": {
                     "default":"masonry",
+                    "impact" :ImpactLayout,
                     "strings":["Stretch to fit", "Keep aspect ratio", "Crop to fit", "Masonry"],
                     "values" :["stretchToFit", "keepAspectRatio", "cropToFit", "masonry"],
                     "tooltips":[
@@ -120,6 +132,7 @@ class ODDSettings(QObject):
             "refreshOnSave": {
                     "label"  :"Refresh on save",
                     "default":"true",
+                    "impact" :ImpactNone,
                     "depends": {
                             "dependsOn":["display"],
                             "evaluator":lambda self: self.settingValue("display", True) == "thumbnails",
@@ -129,6 +142,7 @@ class ODDSettings(QObject):
             "refreshPeriodically": {
                     "label"  :"Refresh periodically",
                     "default":"false",
+                    "impact" :ImpactNone,
                     "depends": {
                             "dependsOn":["display"],
                             "evaluator":lambda self: self.settingValue("display", True) == "thumbnails",
@@ -138,6 +152,7 @@ class ODDSettings(QObject):
             "refreshPeriodicallyChecks": {
                     "label"  :"Checks",
                     "default":"15",
+                    "impact" :ImpactNone,
                     "strings":["1","2","3","4","5","6","8","10","12","15","20","25","30","36","40","45","50"],
                     "suffix" :"/sec",
                     "values" :[1000, 500, 333, 250, 200, 167, 125, 100, 83, 67, 50, 40, 33, 28, 25, 22, 20],
@@ -150,6 +165,7 @@ class ODDSettings(QObject):
             "refreshPeriodicallyDelay": {
                     "label"  :"Delay by",
                     "default":2000,
+                    "impact" :ImpactNone,
                     "strings":lambda msec: ODDSettings.formatMillisecondsToString(msec),
                     "values" :[250, 500, 1000, 1500, 2000, 2500, 3000, 4000, 5000, 6000, 7000, 8000, 10000, 15000, 20000, 30000, 45000, 60000, 120000],
                     "depends": {
@@ -162,6 +178,7 @@ class ODDSettings(QObject):
             "thumbAspectLimit": {
                     "label"  :"Aspect limit",
                     "default":"10",
+                    "impact" :ImpactLayout,
                     "min": 1.0,
                     "max": 10.0,
                     "pow":10,
@@ -175,6 +192,7 @@ class ODDSettings(QObject):
             "thumbDisplayScale": {
                     "label"  :"Display scale",
                     "default":"1.00",
+                    "impact" :ImpactRenderSize,
                     "format" :"{:4.2f}",
                     "min":0.05,
                     "max":1.00,
@@ -187,6 +205,7 @@ class ODDSettings(QObject):
             "thumbDisplayScaleGrid": {
                     "label"  :"Display across",
                     "default":"2",
+                    "impact" :ImpactRenderSize,
                     "strings":[str(i) for i in range(16, 0, -1)],
                     "values":[1/i for i in range(16, 0, -1)],
                     "depends": {
@@ -198,6 +217,7 @@ class ODDSettings(QObject):
             "thumbRenderScale": {
                     "label"  :"Render scale",
                     "default":"1",
+                    "impact" :ImpactRenderSize,
                     "strings":["1/16", "1/8", "1/4", "1/2", "1"],
                     "values" :[1.0/16.0, 1.0/8.0, 1.0/4.0, 1.0/2.0, 1],
                     "depends": {
@@ -210,6 +230,7 @@ class ODDSettings(QObject):
             "thumbFadeAmount": {
                     "label"  :"Fade amount",
                     "default":"0.00",
+                    "impact" :ImpactPaint,
                     "format" :"{:4.2f}",
                     "min":0.00,
                     "max":1.00,
@@ -221,6 +242,7 @@ class ODDSettings(QObject):
             },
             "thumbFadeUnfade": {
                     "default":"false",
+                    "impact" :ImpactPaint,
                     "depends": {
                         "dependsOn":["display"],
                         "evaluator":lambda self: self.settingValue("display", True) == "thumbnails",
@@ -230,6 +252,7 @@ class ODDSettings(QObject):
             "thumbShowModified": {
                     "label"  :"Modified indicator",
                     "default":"corner",
+                    "impact" :ImpactPaint,
                     "strings":["Don't show", "Corner", "Square", "Circle", "Asterisk", "Big Corner", "Big Square", "Big Circle", "Big Asterisk"],
                     "values" :["none", "corner", "square", "circle", "asterisk", "cornerBig", "squareBig", "circleBig", "asteriskBig"],
                     "depends": {
@@ -241,10 +264,12 @@ class ODDSettings(QObject):
             "tooltipShow": {
                     "label"  :"Show tooltips",
                     "default":"true",
+                    "impact" :ImpactNone,
                     "flags"  :["perInstance"],
             },
             "tooltipSizeMode": {
                     "default":"large",
+                    "impact" :ImpactNone,
                     "depends": {
                             "dependsOn":["tooltipShow"],
                             "evaluator": lambda self: self.settingValue("tooltipShow"),
@@ -254,6 +279,7 @@ class ODDSettings(QObject):
             "tooltipThumbLimit": {
                     "label"  :"Limit",
                     "default":"8192",
+                    "impact" :ImpactNone,
                     "strings":["never","128","256","512","1024","2048","4096","8192","16384","always"],
                     "prefix" :"≤",
                     "suffix" :"px²",
@@ -268,6 +294,7 @@ class ODDSettings(QObject):
             "tooltipThumbSize": {
                     "label"  :"Size",
                     "default":"128",
+                    "impact" :ImpactNone,
                     "strings":["24", "32", "64", "96", "128", "160", "192", "256", "384", "512"],
                     "suffix" :"px",
                     "values" :[24, 32, 64, 96, 128, 160, 192, 256, 384, 512],
@@ -280,21 +307,25 @@ class ODDSettings(QObject):
             "showCommonControlsInDocker": {
                     "label"  :"Show commonly used settings in the docker",
                     "default":"true",
+                    "impact" :ImpactNone,
                     "flags"  :["perInstance"],
             },
             "dockerAlignButtonsToSettingsPanel": {
                     "label"  :"Move docker buttons to align with settings panel",
                     "default":"true",
+                    "impact" :ImpactNone,
                     "flags"  :["perInstance"],
             },
             "thumbUseProjectionMethod": {
                     "label"  :"Use projection method",
                     "default":"true",
+                    "impact" :ImpactRenderMethod,
                     "initial":lambda self: self.setUiValuesForCheckboxSetting("thumbUseProjectionMethod"),
             },
             "progressiveThumbs": {
                     "label"  :"Enable progressive thumbnail generation",
                     "default":"true",
+                    "impact" :ImpactNone,
                     "depends": {
                             "dependsOn":["thumbUseProjectionMethod"],
                             "evaluator": lambda self: self.settingValue("thumbUseProjectionMethod"),
@@ -304,6 +335,7 @@ class ODDSettings(QObject):
             "progressiveThumbsWidth": {
                     "label"  :"Block width",
                     "default":"1024",
+                    "impact" :ImpactNone,
                     "strings":lambda v: str(v),
                     "suffix" :"px",
                     "values" :[64, 96, 128, 160, 192, 256, 384, 512, 640, 768, 1024, 1280, 1536, 1792, 2048, 2560, 3072, 3584, 4096, 5120, 6144, 7168, 8192],
@@ -316,6 +348,7 @@ class ODDSettings(QObject):
             "progressiveThumbsHeight": {
                     "label"  :"Block height",
                     "default":"1024",
+                    "impact" :ImpactNone,
                     "strings":lambda v: str(v),
                     "suffix" :"px",
                     "values" :[64, 96, 128, 160, 192, 256, 384, 512, 640, 768, 1024, 1280, 1536, 1792, 2048, 2560, 3072, 3584, 4096, 5120, 6144, 7168, 8192],
@@ -328,6 +361,7 @@ class ODDSettings(QObject):
             "progressiveThumbsSpeed": {
                     "label"  :"Speed",
                     "default":17,
+                    "impact" :ImpactNone,
                     "strings":["10","12","15","20","25","30","36","45","60","65","80","100","120"],
                     "suffix" :" blocks/sec",
                     "values" :[100, 83, 67, 50, 40, 33, 28, 22, 17, 15, 12, 10, 8],
@@ -341,6 +375,7 @@ class ODDSettings(QObject):
             "excessThumbCacheLimit": {
                     "label"  :"Unused limit",
                     "default":"16384",
+                    "impact" :ImpactNone,
                     "strings":lambda kb: ODDSettings.formatBytesToString(kb*1024),
                     "values":[0] + [lerpi(2**(i//2), 2**(i//2+1), 0.5*(i%2)) for i in range(0, 45)][16:45],
                     "initial":lambda self: self.setUiValuesForSliderSetting("excessThumbCacheLimit"),
@@ -592,19 +627,40 @@ class ODDSettings(QObject):
         self.writeSetting("direction", direction)
         self.oddDocker.setDockerDirection(direction)
     
-    def updateListThumbnails(self):
-        if self.readSetting("display") != "thumbnails":
-            return
-        self.oddDocker.list.invalidateItemRectsCache()
-        self.oddDocker.list.updateGeometries()
-        self.oddDocker.list.viewport().update()
-        self.startRefreshAllDelayTimer()
+    def applySettingImpact(self, setting):
+        """
+        do the least work in the docker that the change of setting needs,
+        going by its "impact" in SD. a setting whose dependencies make it
+        have no effect right now (its controls are disabled) needs nothing.
+        """
+        sd = self.SD[setting]
+        impact = sd["impact"] if "impact" in sd else self.ImpactNone
+        if "depends" in sd and "evaluator" in sd["depends"] and not sd["depends"]["evaluator"](self):
+            impact = self.ImpactNone
+        logger.debug("applySettingImpact: %s -> %s", setting, impact)
+        
+        if impact == self.ImpactPaint:
+            # paintEvent reads these settings itself, the draw list can be kept.
+            self.oddDocker.list.scheduleUpdate(ODDListWidget.DirtyPaint)
+        elif impact == self.ImpactLayout:
+            self.oddDocker.list.scheduleUpdate(ODDListWidget.DirtyLayout)
+        elif impact == self.ImpactRenderSize:
+            self.oddDocker.list.scheduleUpdate(ODDListWidget.DirtyLayout)
+            self.startRefreshAllDelayTimer()
+        elif impact == self.ImpactRenderMethod:
+            # thumbnails are cached by size alone, so the ones already made
+            # with the other method would be reused.
+            for docData in self.odd.documents:
+                self.odd.invalidateThumbnails(docData)
+            for docker in self.odd.dockers:
+                docker.list.scheduleUpdate(ODDListWidget.DirtyLayout)
+                docker.vs.startRefreshAllDelayTimer(exact=True)
     
     def changedGridMode(self, index):
         setting = self.settingValue("gridMode")
         logger.debug("changedGridMode to %s", setting)
         self.writeSetting("gridMode", setting)
-        self.updateListThumbnails()
+        self.applySettingImpact("gridMode")
     
     def changedThumbAspectLimitSlider(self, value):
         setting = "{:1.6g}".format(pow(10, value/200.0))
@@ -613,20 +669,20 @@ class ODDSettings(QObject):
         logger.debug("changedThumbAspectLimitSlider: value, setting: %s %s", value, setting)
         #logger.debug("find original value: %s -> %s -> %s", value/200.0, setting, "{:1.3g}".format(math.log10(float(setting))))
         
-        self.updateListThumbnails()
+        self.applySettingImpact("thumbAspectLimit")
     
     def changedThumbDisplayScaleSlider(self, value):
         self.UI["thumbDisplayScale"]["slider"].setValue(value)
         
     def postchangeThumbDisplayScaleSlider(self):
-        self.updateListThumbnails()
+        self.applySettingImpact("thumbDisplayScale")
         self.dockerThumbsDisplayScaleSlider.setValue(self.UI["thumbDisplayScale"]["slider"].value())
     
     def changedThumbDisplayScaleGridSlider(self, value):
         self.UI["thumbDisplayScaleGrid"]["slider"].setValue(value)
         
     def postchangeThumbDisplayScaleGridSlider(self):
-        self.updateListThumbnails()
+        self.applySettingImpact("thumbDisplayScaleGrid")
         self.dockerThumbsDisplayScaleGridSlider.setValue(self.UI["thumbDisplayScaleGrid"]["slider"].value())
     
     def changedThumbRenderScaleSlider(self, value):
@@ -634,7 +690,7 @@ class ODDSettings(QObject):
         self.UI["thumbRenderScale"]["value"].setText(setting)
         self.writeSetting("thumbRenderScale", setting)
         
-        self.startRefreshAllDelayTimer()
+        self.applySettingImpact("thumbRenderScale")
     
     def setUiValuesForThumbShowModified(self, setting):
         self.UI["thumbShowModified"]["btn"].setCurrentText(convertSettingValueToString("thumbShowModified", setting))
@@ -643,16 +699,16 @@ class ODDSettings(QObject):
         setting = self.settingValue("thumbShowModified")
         logger.debug("changedThumbShowModified to %s", setting)
         self.writeSetting("thumbShowModified", setting)
-        self.oddDocker.list.viewport().update()
+        self.applySettingImpact("thumbShowModified")
     
     def highlightedThumbShowModified(self, index):
         setting = self.SD["thumbShowModified"]["values"][index]
         self.previewThumbsShowModified = setting
-        self.oddDocker.list.viewport().update()
+        self.oddDocker.list.scheduleUpdate(ODDListWidget.DirtyPaint)
     
     def unhighlightedThumbShowModified(self):
         self.previewThumbsShowModified = ""
-        self.oddDocker.list.viewport().update()
+        self.oddDocker.list.scheduleUpdate(ODDListWidget.DirtyPaint)
     
     def setUiValuesForTooltipSizeMode(self, setting):
         self.UI["tooltipSizeMode"]["btnSmall" ].setChecked(setting=="small")
@@ -686,7 +742,7 @@ class ODDSettings(QObject):
         setting = self.readSetting("grid")
         self.panelThumbsDisplayScaleStack.setCurrentIndex(1 if setting == "true" else 0)
         self.dockerThumbsDisplayScaleStack.setCurrentIndex(1 if setting == "true" else 0)
-        self.updateListThumbnails()
+        self.applySettingImpact("grid")
     
     def postchangeShowCommonControlsInDocker(self):
         state = self.readSetting("showCommonControlsInDocker") == "true"
@@ -696,12 +752,17 @@ class ODDSettings(QObject):
         self.dockerRefreshPeriodicallyToggleButton.setVisible(state)
         self.oddDocker.buttonWidget.layout().update()
     
-    def startRefreshAllDelayTimer(self):
+    def startRefreshAllDelayTimer(self, exact=False):
+        if exact:
+            self.oddDocker.refreshAllExact = True
+        if self.oddDocker.liveInteraction:
+            # started when the slider is released.
+            return
         delay = self.oddDocker.refreshAllDelay
         delay.start()
     
     def postchangeRefreshPeriodicallyChecksSlider(self):
-        ODDImageChangeDetector.checkTimer.setInterval(self.settingValue("refreshPeriodicallyChecks"))
+        ODDImageChangeDetector.setCheckIntervalMin(self.settingValue("refreshPeriodicallyChecks"))
     
     def postchangeRefreshPeriodicallyDelaySlider(self):
         ODDImageChangeDetector.refreshDelay = self.settingValue("refreshPeriodicallyDelay")
@@ -951,8 +1012,9 @@ class ODDSettings(QObject):
                 setting      = "refreshPeriodically",
                 stateChanged = lambda state: self.changedSettingCheckBox("refreshPeriodically", state, postCallable=self.postchangeRefreshPeriodically),
                 tooltipText  = 
-                        "Automatically refresh the thumbnail for the active image if a change is detected.\n\n" + 
-                        "Checks for changes to the image so-many times each second.\n" +
+                        "Automatically refresh the thumbnail for an image if a change is detected.\n\n" + 
+                        "Checks for changes to the active image so-many times each second,\n" +
+                        "and to one of the other open images at each check, taking turns.\n" +
                         "Then tries to refresh the thumbnail every so-many seconds.\n" +
                         "May not catch quick changes if they happen between checks.\n" +
                         "Aggressive settings may degrade performance."
@@ -968,7 +1030,9 @@ class ODDSettings(QObject):
         self.panelThumbsRefreshPeriodicallyChecksLayout, self.panelThumbsRefreshPeriodicallyChecksLabel = self.createPanelSliderControlsForSetting(
                 setting     = "refreshPeriodicallyChecks",
                 value       = convertSettingStringToValue("refreshPeriodicallyChecks", setting),
-                tooltipText = "Number of times each second the image is checked for activity."
+                tooltipText =
+                        "Number of times each second the image is checked for activity.\n\n" +
+                        "Checks become less frequent while no activity is seen, and return to this rate when it is."
         )
         
         setting = self.readSetting("refreshPeriodicallyDelay")
@@ -1038,7 +1102,7 @@ class ODDSettings(QObject):
         
         self.createPanelCheckBoxControlsForSetting(
                 setting = "thumbUseProjectionMethod",
-                stateChanged = lambda state: self.changedSettingCheckBox("thumbUseProjectionMethod", state, postCallable=self.startRefreshAllDelayTimer),
+                stateChanged = lambda state: self.changedSettingCheckBox("thumbUseProjectionMethod", state, postCallable=lambda: self.applySettingImpact("thumbUseProjectionMethod")),
                 tooltipText = 
                         "If enabled, ODD will generate thumbnails with the projection method.\n" +
                         "If disabled, ODD will use the thumbnail method.\n" +
@@ -1235,10 +1299,10 @@ class ODDSettings(QObject):
                 lambda value: self.changedSettingSlider("thumbDisplayScaleGrid", value, postCallable=self.postchangeThumbDisplayScaleGridSlider)
         )
         self.UI["thumbRenderScale"         ]["slider"].valueChanged.connect(
-                lambda value: self.changedSettingSlider("thumbRenderScale", value, postCallable=self.startRefreshAllDelayTimer)
+                lambda value: self.changedSettingSlider("thumbRenderScale", value, postCallable=lambda: self.applySettingImpact("thumbRenderScale"))
         )
         self.UI["thumbFadeAmount"          ]["slider"].valueChanged.connect(
-                lambda value: self.changedSettingSlider("thumbFadeAmount", value, postCallable=self.oddDocker.list.viewport().update)
+                lambda value: self.changedSettingSlider("thumbFadeAmount", value, postCallable=lambda: self.applySettingImpact("thumbFadeAmount"))
         )
         self.UI["thumbShowModified"        ]["btn"   ].activated.connect(self.changedThumbShowModified)
         self.UI["thumbShowModified"        ]["btn"   ].highlighted.connect(self.highlightedThumbShowModified)
@@ -1270,6 +1334,16 @@ class ODDSettings(QObject):
         
         self.dockerThumbsDisplayScaleSlider.valueChanged.connect(self.changedThumbDisplayScaleSlider)
         self.dockerThumbsDisplayScaleGridSlider.valueChanged.connect(self.changedThumbDisplayScaleGridSlider)
+        
+        for setting, slider in (
+                ("thumbAspectLimit",      self.UI["thumbAspectLimit"]["slider"]),
+                ("thumbDisplayScale",     self.UI["thumbDisplayScale"]["slider"]),
+                ("thumbDisplayScaleGrid", self.UI["thumbDisplayScaleGrid"]["slider"]),
+                ("thumbDisplayScale",     self.dockerThumbsDisplayScaleSlider),
+                ("thumbDisplayScaleGrid", self.dockerThumbsDisplayScaleGridSlider),
+        ):
+            slider.sliderPressed.connect(self.oddDocker.beginLiveInteraction)
+            slider.sliderReleased.connect(lambda s=setting: self.oddDocker.endLiveInteraction(s))
         self.postchangeShowCommonControlsInDocker()
         
         for setting in self.SD:
@@ -1474,3 +1548,4 @@ ODDSettings.cacheSettingsDataDependencies()
 ODDSettings.setupGlobalSettings()
 
 from .oddimagechangedetector import ODDImageChangeDetector
+from .oddlistwidget import ODDListWidget
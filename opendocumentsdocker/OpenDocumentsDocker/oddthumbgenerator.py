@@ -96,19 +96,26 @@ class ODDThumbGenerator(QObject):
         self.thumb = QImage(self.thumbWidth, self.thumbHeight, QImage.Format_ARGB32_Premultiplied)
         self.thumb.fill(Qt.transparent)
         
-        self.stepTimer.start()
+        ODDIdleGovernor.startTimer(self.stepTimer)
     
     def stop(self):
         logger.debug("ODDThumbGenerator: stop %s", self.doc.fileName() if type(self.doc)==Document else "(no doc)")
+        self.stepTimer.stop()
+        ODDIdleGovernor.forgetTimer(self.stepTimer)
         self.processor.close()
     
     def step(self):
+        if ODD.documentIsBusy(self.doc):
+            # don't read the projection mid-change, try again next step.
+            ODDIdleGovernor.startTimer(self.stepTimer)
+            return
         try:
             #logger.debug("ODDThumbGenerator: step")
             next(self.processor)
             #logger.debug("ODDThumbGenerator: start timer for next step")
-            self.stepTimer.start()
+            ODDIdleGovernor.startTimer(self.stepTimer)
         except StopIteration:
+            ODDIdleGovernor.forgetTimer(self.stepTimer)
             self.processor = None
             logger.debug("ODDThumbGenerator: finished %s", self.doc.fileName() if type(self.doc)==Document else "(no doc)")
             if self.finishedCallback:
@@ -182,3 +189,6 @@ class ODDThumbGenerator(QObject):
             
             #logger.debug("ODDThumbGenerator: processed block")
             yield
+
+
+from .oddidlegovernor import ODDIdleGovernor
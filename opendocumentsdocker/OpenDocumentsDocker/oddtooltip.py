@@ -0,0 +1,139 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from PyQt5.QtCore import Qt, QSize, QTimer
+from PyQt5.QtGui import QTextDocument, QPalette
+from PyQt5.QtWidgets import QTextBrowser, QFrame
+from .odd import ODD
+
+import logging
+logger = logging.getLogger("odd")
+
+
+class ODDToolTip(QTextBrowser):
+    """
+    tooltip for the docker's list items.
+    thumbnails are loaded from the ODD thumbnail cache as in-memory
+    resources, and the html for each document is kept until something
+    it shows has changed.
+    """
+    ThumbUrlScheme = "oddthumb"
+    
+    def __init__(self, parent, showCallback):
+        super(ODDToolTip, self).__init__(parent)
+        self.setWindowFlags(Qt.ToolTip)
+        self.setFrameShape(QFrame.NoFrame)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setLineWrapMode(QTextBrowser.NoWrap)
+        self.setTextInteractionFlags(Qt.NoTextInteraction)
+        self.setFocusPolicy(Qt.NoFocus)
+        self.setOpenLinks(False)
+        self.document().setDocumentMargin(0)
+        
+        # look like a label.
+        palette = self.palette()
+        palette.setColor(QPalette.Base, palette.color(QPalette.Window))
+        palette.setColor(QPalette.Text, palette.color(QPalette.WindowText))
+        self.setPalette(palette)
+        
+        self.htmlCache = {}
+        self.shownHtml = None
+        
+        # don't build tooltips for items the mouse is only passing over.
+        self.showCallback = showCallback
+        self.pendingDocId = None
+        self.showDelay = QTimer(self)
+        self.showDelay.setInterval(60)
+        self.showDelay.setSingleShot(True)
+        self.showDelay.timeout.connect(self.showDelayTimeout)
+    
+    def requestShow(self, docId):
+        self.pendingDocId = docId
+        self.showDelay.start()
+    
+    def showDelayTimeout(self):
+        self.showCallback(self.pendingDocId)
+    
+    def hide(self):
+        self.showDelay.stop()
+        super().hide()
+    
+    def forgetDocument(self, docId):
+        self.htmlCache.pop(docId, None)
+        if self.pendingDocId == docId:
+            self.hide()
+    
+    def sizeHint(self):
+        size = self.document().size().toSize()
+        margins = self.contentsMargins()
+        return QSize(size.width() + margins.left() + margins.right(), size.height() + margins.top() + margins.bottom())
+    
+    def setContentForDocument(self, docData, sizeMode, thumbLimit, thumbSize):
+        doc = docData.document
+        signature = (sizeMode, thumbLimit, thumbSize, docData.generation, doc.fileName(), doc.modified(), doc.width(), doc.height())
+        cached = self.htmlCache.get(docData.id)
+        if cached and cached[0] == signature:
+            html = cached[1]
+        else:
+            logger.debug("ODDToolTip: build html for %s", docData)
+            html = self.buildHtml(docData, sizeMode, thumbLimit, thumbSize)
+            self.htmlCache[docData.id] = (signature, html)
+        
+        if html is not self.shownHtml:
+            self.setHtml(html)
+            self.shownHtml = html
+    
+    def buildHtml(self, docData, sizeMode, thumbLimit, thumbSize):
+        doc = docData.document
+        fPath = doc.fileName()
+        
+        isSmall = sizeMode == "small"
+        isLarge = sizeMode == "large"
+        pad = 0 if isSmall else 16 if isLarge else 4
+        
+        ttText = "<table border='0' style='margin:{}px; padding:{}px'><tr>\n".format(pad, pad)
+        
+        imgHtml = ""
+        w = doc.width()
+        h = doc.height()
+        if w * h <= thumbLimit:
+            if w > h:
+                size = QSize(thumbSize, int(thumbSize * (h / w)))
+            else:
+                size = QSize(int(thumbSize * (w / h)), thumbSize)
+            # the generation makes the url change when the image does.
+            imgHtml = "<img src='{}:{}/{}/{}/{}' width={} height={}>".format(
+                    self.ThumbUrlScheme, docData.id, size.width(), size.height(), docData.generation, size.width(), size.height()
+            )
+        
+        if imgHtml:
+            s = " style='margin:0px; padding:0px'" if not isLarge else ""
+            ttText += "<td{}>\n<table border='{}'><tr><td{}>{}</td></tr></table>\n</td>\n".format(s, "0" if isSmall else "1", s, imgHtml)
+        if isSmall:
+            ttText += "<td valign=middle>"
+            ttText += "<b>{}</b>{}\n".format(ODD.documentDisplayName(doc), "&nbsp;"*3)
+            ttText += "<small>{}</small>{}\n".format(fPath, "&nbsp;"*3)
+            ttText += "<small>{} x {}</small>\n".format(w, h)
+            ttText += "</td></tr></table>\n"
+        else:
+            hTag = "h2" if isLarge else "h3"
+            ttText += "<td style='padding-left:{}px'>\n<{} style='margin:0px'>{}</{}>\n".format(
+                    pad//2, hTag, ODD.documentDisplayName(doc), hTag
+            )
+            ttText += "<p style='white-space:pre; margin:0px'><small>{}</small></p>\n".format(fPath)
+            ttText += "<p style='margin:0px'><small>{} x {}</small></p>\n".format(w, h)
+            ttText += "</td></tr></table>"
+        
+        return ttText
+    
+    def loadResource(self, resourceType, url):
+        if resourceType != QTextDocument.ImageResource or url.scheme() != self.ThumbUrlScheme:
+            return super().loadResource(resourceType, url)
+        
+        docId, width, height, generation = (int(part) for part in url.path().split("/"))
+        docData = ODD.docDataFromId(docId)
+        if not docData:
+            return None
+        doc = docData.document
+        logger.debug("ODDToolTip: loading thumbnail %sx%s for %s", width, height, docData)
+        return ODD.requestThumbnail(docData, (width, height, doc.width(), doc.height()), forceNotProgressive=True)
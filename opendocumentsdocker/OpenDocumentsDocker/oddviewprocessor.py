@@ -49,15 +49,16 @@ class ODDViewProcessor(QObject):
     
     def start(self):
         logger.debug("ODDViewProcessor: start %s", self)
-        self.stepTimer.start()
+        ODDIdleGovernor.startTimer(self.stepTimer)
 
     def step(self):
         try:
             #logger.debug("ODDViewProcessor: step")
             next(self.processor)
             #logger.debug("ODDViewProcessor: start timer for next step")
-            self.stepTimer.start()
+            ODDIdleGovernor.startTimer(self.stepTimer)
         except StopIteration:
+            ODDIdleGovernor.forgetTimer(self.stepTimer)
             self.processor = None
             logger.debug("ODDViewProcessor: finished")
             if self.finishedCallback:
@@ -67,7 +68,7 @@ class ODDViewProcessor(QObject):
         logger.debug("ODDViewProcessor: begin processor")
         
         viewCount = 0
-        for v in ODD.views:
+        for v in (entry.view for entry in ODD.views.values()):
             if self.selectionCondition(v):
                 viewCount += 1
                 if viewCount > 1:
@@ -132,3 +133,6 @@ class ODDViewProcessor(QObject):
             logger.debug("ODDViewProcessor: processed view")
             doc.waitForDone()
             yield
+
+
+from .oddidlegovernor import ODDIdleGovernor